@@ -1,145 +1,212 @@
-import sqlite3
 from datetime import datetime, timedelta
-from database import create_tables as create_employees_tables  # Import the create_tables function for employees
-
-DATABASE_FILE = "attendance.db"
-EMPLOYEES_DATABASE_FILE = "employees.db"
+from itertools import chain, groupby
+from operator import itemgetter
+from database import get_connection
+from employee import iter_employees, employee_cache
+from intervals import IntervalIndex
 
 def create_tables():
-    # make the connection with database file
-    with sqlite3.connect(DATABASE_FILE) as connection:
-        cursor = connection.cursor()
-
-        # Create attendance table if it doesn't exists
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS attendance (
-                eid INTEGER,
-                action TEXT,
-                timestamp DATETIME,
-                FOREIGN KEY (eid) REFERENCES employees(eid)
-            )
-        """)
+    # make sure the attendance table exists (it lives in the shared database file)
+    get_connection()
 
 # get the data from employees table
 def get_employees():
-    with sqlite3.connect(EMPLOYEES_DATABASE_FILE) as connection:
-        cursor = connection.cursor()
-
-        # Create tables if they don't exist in employees database
-        create_employees_tables()
+    employees = []
+    generation = employee_cache.generation()
+    for emp in iter_employees():
+        employee_cache.put(emp.eid, emp, generation) # warm the cache for the lookups that follow
+        employees.append({'eid': emp.eid, 'fname': emp.fname, 'lname': emp.lname})
+    return employees
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+EPOCH = datetime(1970, 1, 1)
+
+# seconds since 1970-01-01 for a wall clock datetime, stored next to the timestamp text
+def to_epoch(dt):
+    return int((dt - EPOCH).total_seconds())
+
+def from_epoch(seconds):
+    return EPOCH + timedelta(seconds=seconds)
+
+DAY_SECONDS = 24 * 60 * 60
+
+ADD_DAILY_QUERY = """
+    INSERT INTO hours_daily (eid, day, seconds) VALUES (?, ?, ?)
+    ON CONFLICT(eid, day) DO UPDATE SET seconds = seconds + excluded.seconds
+"""
+
+ADD_WEEKLY_QUERY = """
+    INSERT INTO hours_weekly (eid, week_start, seconds) VALUES (?, ?, ?)
+    ON CONFLICT(eid, week_start) DO UPDATE SET seconds = seconds + excluded.seconds
+"""
+
+def week_start(day):
+    # weeks start on Sunday
+    return day - timedelta(days=(day.weekday() + 1) % 7)
+
+# split a shift at midnight, yields (day, seconds worked that day)
+def day_pieces(punch_in, punch_out):
+    while punch_in < punch_out:
+        day_start = punch_in - punch_in % DAY_SECONDS
+        piece_end = min(punch_out, day_start + DAY_SECONDS)
+        yield from_epoch(day_start).date(), piece_end - punch_in
+        punch_in = piece_end
+
+def add_shift_to_rollup(cursor, eid, punch_in, punch_out):
+    pieces = list(day_pieces(punch_in, punch_out))
+    cursor.executemany(ADD_DAILY_QUERY, [(eid, day.isoformat(), seconds) for day, seconds in pieces])
+    cursor.executemany(ADD_WEEKLY_QUERY, [(eid, week_start(day).isoformat(), seconds) for day, seconds in pieces])
+
+# recompute the rollup tables with the cursor, inside the caller's transaction
+def rebuild_rollup(cursor):
+    daily = {}
+    weekly = {}
+    # every employee's punches in order straight from the (eid, epoch) index
+    cursor.execute("SELECT eid, action, epoch FROM attendance ORDER BY eid, epoch, rowid")
+    for eid, punch_in, punch_out in iter_shifts(cursor.fetchall()):
+        for day, seconds in day_pieces(punch_in, punch_out):
+            key = (eid, day.isoformat())
+            daily[key] = daily.get(key, 0) + seconds
+            key = (eid, week_start(day).isoformat())
+            weekly[key] = weekly.get(key, 0) + seconds
+
+    cursor.execute("DELETE FROM hours_daily")
+    cursor.execute("DELETE FROM hours_weekly")
+    cursor.executemany("INSERT INTO hours_daily (eid, day, seconds) VALUES (?, ?, ?)",
+                       [(eid, day, seconds) for (eid, day), seconds in daily.items()])
+    cursor.executemany("INSERT INTO hours_weekly (eid, week_start, seconds) VALUES (?, ?, ?)",
+                       [(eid, week, seconds) for (eid, week), seconds in weekly.items()])
+    return len(daily)
+
+# recompute hours_daily and hours_weekly from the whole attendance table
+def rebuild_hours_rollup():
+    with get_connection() as connection:
+        return rebuild_rollup(connection.cursor())
+
+PUNCH_ACTIONS = ("Punch-In", "Punch-Out")
+
+# write one punch at the given time with the cursor, inside the caller's transaction
+# a Punch-Out right after a Punch-In closes a shift and is added to the hours totals
+def record_punch(cursor, eid, action, now):
+    epoch = to_epoch(now)
+    if action == "Punch-Out":
+        cursor.execute("SELECT action, epoch FROM attendance WHERE eid = ? ORDER BY epoch DESC, rowid DESC LIMIT 1",
+                       (eid,))
+        last = cursor.fetchone()
+        if last and last[0] == "Punch-In":
+            add_shift_to_rollup(cursor, eid, last[1], epoch)
+
+    # Insert attendance record
+    cursor.execute("INSERT INTO attendance (eid, action, timestamp, epoch) VALUES (?, ?, ?, ?)",
+                   (eid, action, now.strftime(TIME_FORMAT), epoch))
+    return now.strftime(TIME_FORMAT)
 
-        # Fetch all employees
-        cursor.execute("SELECT * FROM employees")
-        employees = cursor.fetchall()
-
-    return [{'eid': emp[0], 'fname': emp[1], 'lname': emp[2]} for emp in employees]
 def log_attendance(employee, action):
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    now = datetime.now().replace(microsecond=0)
+    with get_connection() as connection:
+        return record_punch(connection.cursor(), employee['eid'], action, now) # when the punch was recorded
 
-    with sqlite3.connect(DATABASE_FILE) as connection:
+# worked hours from the rollup, first_day and last_day included
+def hours_between(eid, first_day, last_day):
+    with get_connection() as connection:
         cursor = connection.cursor()
-
-        # Create tables if it doesn't exist
-        create_tables()
-
-        # Insert attendance record
-        cursor.execute("INSERT INTO attendance (eid, action, timestamp) VALUES (?, ?, ?)",
-                       (employee['eid'], action, timestamp))
-
-    return True
+        cursor.execute("SELECT COALESCE(SUM(seconds), 0) FROM hours_daily WHERE eid = ? AND day BETWEEN ? AND ?",
+                       (int(eid), first_day.isoformat(), last_day.isoformat()))
+        return cursor.fetchone()[0] / 3600
+
+# pair every Punch-Out with the Punch-In right before it, in one pass over logs sorted by time
+# (epoch, then rowid for punches in the same second); every report pairs punches through here
+# logs are (action, epoch) rows, yields (punch in, punch out) epochs
+# with now, a shift still open at the end (a Punch-In with no Punch-Out yet) runs until now
+def pair_punches(logs, now=None):
+    punch_in = None
+    for action, epoch in logs:
+        if action == "Punch-In":
+            punch_in = epoch
+        elif action == "Punch-Out" and punch_in is not None:
+            yield punch_in, epoch
+            punch_in = None
+    if now is not None and punch_in is not None and punch_in <= now:
+        yield punch_in, max(now, punch_in + 1)
+
+# rows are (eid, action, epoch, *extra) sorted by eid, epoch and rowid, yields (eid, punch in, punch out, *extra)
+# extra columns (e.g. the name) are taken from the employee's first row
+def iter_shifts(rows, now=None):
+    for eid, logs in groupby(rows, key=itemgetter(0)):
+        first = next(logs)
+        extra = first[3:]
+        for punch_in, punch_out in pair_punches(((row[1], row[2]) for row in chain((first,), logs)), now):
+            yield (eid, punch_in, punch_out, *extra)
 
 #calculating the hours by weekly and day
 def calculate_hours(employee, mode='recent'):
-    eid = str(employee['eid'])
-
-    with sqlite3.connect(DATABASE_FILE) as connection:
+    eid = int(employee['eid'])
+    today = datetime.today().date()
+
+    if mode == 'weekly':
+        # one row of the weekly rollup
+        with get_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute("SELECT seconds FROM hours_weekly WHERE eid = ? AND week_start = ?",
+                           (eid, week_start(today).isoformat()))
+            row = cursor.fetchone()
+        return row[0] / 3600 if row else 0
+
+    if mode == 'monthly':
+        return hours_between(eid, today.replace(day=1), today)
+
+    with get_connection() as connection:
         cursor = connection.cursor()
 
-        # Create tables if it doesn't exist
-        create_tables()
-
-        # fetch the data from the attendance table
-        cursor.execute("SELECT action, timestamp FROM attendance WHERE eid = ? ORDER BY timestamp", (eid,))
+        # fetch the data from the attendance table, the (eid, epoch) index gives it already sorted
+        cursor.execute("SELECT action, epoch FROM attendance WHERE eid = ? ORDER BY epoch, rowid", (eid,))
         logs = cursor.fetchall()
 
-    if mode == 'recent':
-        if len(logs) < 2:
-            return 0
-        punch_ins = [log[1] for log in logs if log[0] == 'Punch-In']
-        punch_outs = [log[1] for log in logs if log[0] == 'Punch-Out']
-
-        ts = 0
-        for pot in punch_outs:
-            cpi = min((pit for pit in punch_ins if pit < pot),
-                                   key=lambda x: abs(datetime.strptime(x, '%Y-%m-%d %H:%M:%S') - datetime.strptime(pot, '%Y-%m-%d %H:%M:%S')))
-            ts += (datetime.strptime(pot, '%Y-%m-%d %H:%M:%S') - datetime.strptime(cpi, '%Y-%m-%d %H:%M:%S')).total_seconds()
-
-        return ts / 3600
-
-    elif mode == 'weekly':
-        ts = 0
-        pis = None
-        today = datetime.today()
-        ls = today - timedelta(days=(today.weekday() + 1) % 7)
-        for log in logs:
-            action, timestamp = log
-            if action == "Punch-In":
-                punch_time = datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S')
-                if ls <= punch_time <= today:
-                    print(f"Punch-In: {punch_time}")
-                    pis = punch_time
-            elif action == "Punch-Out" and pis:
-                pot = datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S')
-                if ls <= pot <= today:
-                    print(f"Punch-Out: {pot}")
-                    ts += (pot - pis).total_seconds()
-                    pis = None
-
-        return ts / 3600
-
-def ewd(sh, sm, eh, em):
-
-    with sqlite3.connect(DATABASE_FILE) as connection:
-        cursor = connection.cursor()
-
-        # Check if the attendance table exists
-        cursor.execute("PRAGMA table_info(attendance)")
-        if not cursor.fetchall():
-            # If the attendance table does not exist, return an empty list
-            return []
-
-        wei = set()  # Using a set to store unique employee IDs
+    ts = 0
+    for punch_in, punch_out in pair_punches(logs):
+        ts += punch_out - punch_in
 
-        td = datetime.today().date()
-        sdt = datetime(td.year, td.month, td.day, sh, sm)
-        edt = datetime(td.year, td.month, td.day, eh, em)
+    return ts / 3600
 
-        # Fetch attendance data for today's date and the given time range
+# every shift that overlaps the [start, end) epochs as (punch in, punch out, eid)
+# a shift still open (Punch-In without a Punch-Out yet) runs until now
+def shift_intervals(start, end, now=None):
+    now = to_epoch(datetime.now()) if now is None else now
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        # employees in eid order, each one's punches straight from the (eid, epoch) index,
+        # from the last punch before start so a shift already running at start is seen however long it is
         cursor.execute("""
-            SELECT DISTINCT eid, timestamp
-            FROM attendance
-            WHERE timestamp BETWEEN ? AND ?
-        """, (sdt.strftime('%Y-%m-%d %H:%M:%S'), edt.strftime('%Y-%m-%d %H:%M:%S')))
+            SELECT a.eid, a.action, a.epoch
+            FROM employees e NOT INDEXED CROSS JOIN attendance a ON a.eid = e.eid
+            WHERE a.epoch >= COALESCE((SELECT MAX(epoch) FROM attendance WHERE eid = e.eid AND epoch < :start), :start)
+              AND a.epoch < :end
+            ORDER BY e.eid, a.epoch, a.rowid
+        """, {"start": start, "end": end})
         rows = cursor.fetchall()
 
-        for row in rows:
-            eid, timestamp = row
-            wei.add(eid)
-
-        return list(wei)
+    return [(punch_in, punch_out, eid) for eid, punch_in, punch_out in iter_shifts(rows, now)
+            if punch_in < end and punch_out > start]
+
+# who was on shift during each (start, end) datetime window, one set of employee IDs per window
+def who_was_working(windows):
+    if not windows:
+        return []
+    epochs = [(to_epoch(start), to_epoch(end)) for start, end in windows]
+    first = min(start for start, _ in epochs)
+    last = max(max(start, end) for start, end in epochs) + 1
+    index = IntervalIndex(shift_intervals(first, last))
+    return [set(eids) for eids in index.overlapping_many(epochs)]
+
+# employees working between sh:sm and eh:em on day (today by default)
+def ewd(sh, sm, eh, em, day=None):
+    td = datetime.today().date() if day is None else day
+    sdt = datetime(td.year, td.month, td.day, sh, sm)
+    edt = datetime(td.year, td.month, td.day, eh, em)
+    return sorted(who_was_working([(sdt, edt)])[0])
 
 #attendance menu
 def attendance_menu():
-    # Check if the attendance table exists
-    with sqlite3.connect(DATABASE_FILE) as connection:
-        cursor = connection.cursor()
-        cursor.execute("PRAGMA table_info(attendance)")
-        table_info = cursor.fetchall()
-
-        if not table_info:
-            # If the attendance table does not exist, create it
-            create_tables()
-
     employees = get_employees()
 
     if not employees:
@@ -154,7 +221,7 @@ def attendance_menu():
     if 1 <= ch <= len(employees):
         se = employees[ch - 1]
         print(f"Hello, {se['fname']} {se['lname']}.")
-        print("1. Punch-In\n2. Punch-Out\n3. Total Hours\n4. Total Weekly Hours")
+        print("1. Punch-In\n2. Punch-Out\n3. Total Hours\n4. Total Weekly Hours\n5. Total Monthly Hours")
         ac = int(input("Enter your choice: "))
         if ac == 1:
             if log_attendance(se, "Punch-In"):
@@ -168,80 +235,10 @@ def attendance_menu():
         elif ac == 4:
             hours = calculate_hours(se, 'weekly')
             print(f"You've worked for {hours:.2f} weekly hours.")
+        elif ac == 5:
+            hours = calculate_hours(se, 'monthly')
+            print(f"You've worked for {hours:.2f} hours this month.")
         else:
             print("Invalid choice!")
     else:
         print("Invalid choice!")
-
-def tips_distribution():
-    # Option for distributing tips
-    ch = ['yes', 'no']
-    print("Do you want to distribute tips? (yes/no)")
-    for i, ch in enumerate(ch, start=1):
-        print(f"{i}. {ch}")
-    try:
-        dis = int(input()) - 1
-        dc = ch[dis].lower()
-    except (ValueError, IndexError):
-        dc = None  # Invalid choice
-
-    if dc == 'yes':
-        tr = input("Enter the time range (e.g., 8 or 20-20:30) to check how many employees are working: ")
-        if '-' in tr:
-            sts, ets = tr.split('-')
-            # Check if minutes are included in the start_time_str
-            if ':' in sts:
-                sh, sm = map(int, sts.split(':'))
-            else:
-                sh, sm= int(sts), 0
-            # Check if minutes are included in the end_time_str
-            if ':' in ets:
-                eh, em = map(int, ets.split(':'))
-            else:
-                eh, em = int(ets), 0
-        else:
-            sh, sm, eh, em = int(tr), 0, int(tr), 0
-
-        # Fetch working employee IDs for the specified time range
-        weid = ewd(sh, sm, eh, em)
-
-        if not weid:
-            print(f"No employees are working between hours {sh:02d}:{sm:02d}-{eh:02d}:{em:02d}.")
-        else:
-            print(f"{len(weid)} employees are working between hours {sh:02d}:{sm:02d}-{eh:02d}:{em:02d}.")
-
-            # Establish connections to both databases
-            with sqlite3.connect(DATABASE_FILE) as attendance_connection:
-                with sqlite3.connect(EMPLOYEES_DATABASE_FILE) as employees_connection:
-                    # Create cursors for both connections
-                    ec = employees_connection.cursor()
-
-                    # Retrieve employee names using the fetched employee IDs
-                    emp = []
-                    for eid in weid:
-                        ec.execute("SELECT fname FROM employees WHERE eid = ?", (eid,))
-                        result = ec.fetchone()
-                        if result:
-                            ec.append(result[0])
-
-                    if not ec:
-                        print("No employee names found.")
-                    else:
-                        print("Employees who worked during this time range:")
-                        for emp in emp:
-                            print(f"- {emp}")
-
-                    tips = float(input("Enter the total tips for that time range: "))
-
-                    if tips <= 0:
-                        print("Invalid total tips value. Exiting tips distribution.")
-                        return
-
-                    tpe = tips / len(weid)
-                    print(f"Each employee gets {tpe:.2f} from the tips.")
-    elif dc == 'no':
-        print("Okay, have a nice day!")
-    else:
-        print("Invalid choice!")
-
-
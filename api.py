@@ -0,0 +1,402 @@
+#api.py
+# local HTTP/JSON API over the employee, schedule and attendance modules, for kiosks and dashboards
+# one asyncio event loop serves every client; the SQLite work runs on a bounded thread pool (each worker
+# thread keeps its own pooled connection) and punches go through the group-committing punch service
+# connections are kept alive between requests, and list endpoints stream a JSON array with chunked
+# transfer encoding while the rows are still being read
+# usage: python api.py --port 8080
+#        curl localhost:8080/employees?pos=Cook
+#        curl -X POST localhost:8080/punches -d '{"eid": 7, "action": "in"}'
+#
+#   GET    /employees              search (fname, lname, pos, email, joined_from, joined_to, text)
+#   POST   /employees              add one employee, or a JSON array of them
+#   GET    /employees/{eid}
+#   PATCH  /employees/{eid}        change some fields (PUT does the same)
+#   DELETE /employees/{eid}
+#   GET    /availability           ?from=&to= -> {"dates", "eids", "matrix"}
+#   POST   /availability           {"date", "eid", "shift"} or an array, written in one transaction
+#   GET    /schedule               ?from=&to=&eid=
+#   POST   /schedule               {"date", "eid", "morning": "09:00-12:00", "evening": ...} or an array
+#   POST   /punches                {"eid", "action": "in" | "out"} or an array
+#   GET    /hours/{eid}            ?mode=recent|weekly|monthly or ?from=&to=
+#   POST   /tips                   {"date", "windows": ["11-15=120.50", ...]}
+#   GET    /stats                  per-statement query timings, slow queries and punch service counters
+#   DELETE /stats                  start the query timings over
+import argparse
+import asyncio
+import json
+import logging
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qsl
+import cli
+from database import connection_stats, query_stats, slow_queries, reset_query_stats
+from schedule import availability_matrix
+from punches import get_punch_service, punch_stats
+
+WORKERS = 8  # threads running SQLite work
+KEEPALIVE_TIMEOUT = 15  # seconds an idle connection is kept open
+MAX_BODY = 10 * 1024 * 1024
+STREAM_BATCH = 200  # rows serialised per chunk of a streamed list
+STREAM_BUFFER = 8  # chunks queued ahead of a slow client before the producing thread waits
+PUNCH_ACTIONS = {"in": "Punch-In", "out": "Punch-Out", "Punch-In": "Punch-In", "Punch-Out": "Punch-Out"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _status(e):
+    # HTTP status for an error raised by the command functions
+    if isinstance(e, HTTPError):
+        return e.status
+    if isinstance(e, KeyError):
+        return HTTPStatus.BAD_REQUEST
+    if isinstance(e, LookupError):
+        return HTTPStatus.NOT_FOUND
+    if isinstance(e, (ValueError, TypeError)):
+        return HTTPStatus.BAD_REQUEST
+    if isinstance(e, sqlite3.IntegrityError):
+        return HTTPStatus.CONFLICT
+    return HTTPStatus.INTERNAL_SERVER_ERROR
+
+
+class Request:
+    def __init__(self, method, target, headers, body):
+        parts = urlsplit(target)
+        self.method = method
+        self.path = parts.path.rstrip("/") or "/"
+        self.query = dict(parse_qsl(parts.query))
+        self.headers = headers
+        self.body = body
+        self.params = {}
+
+    def json(self):
+        if not self.body:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "A JSON body is required.")
+        try:
+            return json.loads(self.body)
+        except json.JSONDecodeError as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Invalid JSON: {e}")
+
+    def items(self):
+        # the body as a list of input objects, and whether it was sent as an array
+        data = self.json()
+        if isinstance(data, list):
+            return data, True
+        if isinstance(data, dict):
+            return [data], False
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Expected a JSON object or array.")
+
+
+class JSONResponse:
+    def __init__(self, data, status=HTTPStatus.OK):
+        self.data = data
+        self.status = status
+
+
+class StreamResponse:
+    # rows() is called on a worker thread and its dicts are sent as one JSON array
+    def __init__(self, rows):
+        self.rows = rows
+
+
+class Server:
+    def __init__(self, workers=WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api-db")
+        self.routes = []
+        self.add_route("GET", "/employees", self.list_employees)
+        self.add_route("POST", "/employees", self.add_employees)
+        self.add_route("GET", "/employees/{eid}", self.get_employee)
+        self.add_route("PATCH", "/employees/{eid}", self.update_employee)
+        self.add_route("PUT", "/employees/{eid}", self.update_employee)
+        self.add_route("DELETE", "/employees/{eid}", self.delete_employee)
+        self.add_route("GET", "/availability", self.get_availability)
+        self.add_route("POST", "/availability", self.set_availability)
+        self.add_route("GET", "/schedule", self.list_schedule)
+        self.add_route("POST", "/schedule", self.set_schedule)
+        self.add_route("POST", "/punches", self.punch)
+        self.add_route("GET", "/hours/{eid}", self.get_hours)
+        self.add_route("POST", "/tips", self.share_tips)
+        self.add_route("GET", "/stats", self.get_stats)
+        self.add_route("DELETE", "/stats", self.reset_stats)
+
+    def add_route(self, method, pattern, handler):
+        regex = re.compile("^" + re.sub(r"\{(\w+)\}", r"(?P<\1>\\d+)", pattern) + "$")
+        self.routes.append((method, regex, handler))
+
+    async def run_db(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def apply(self, command, request, extra=None):
+        # run a command from cli for the request body (or extra alone when there is no body)
+        # an array body answers with one result per object, errors included in place
+        if extra is not None and not request.body:
+            items, many = [extra], False
+        else:
+            items, many = request.items()
+            if extra:
+                items = [{**item, **extra} for item in items]
+        if many:
+            return JSONResponse(await self.run_db(lambda: list(cli.results(command, items))))
+        output = await self.run_db(lambda: list(command(items)))
+        return JSONResponse(output[0] if len(output) == 1 else output)
+
+    # routes
+
+    async def list_employees(self, request):
+        return StreamResponse(lambda: cli.employee_view([request.query]))
+
+    async def add_employees(self, request):
+        response = await self.apply(cli.employee_add, request)
+        if isinstance(response.data, dict):
+            response.status = HTTPStatus.CREATED
+        return response
+
+    async def get_employee(self, request):
+        return JSONResponse((await self.run_db(lambda: list(cli.employee_view([request.params]))))[0])
+
+    async def update_employee(self, request):
+        data = request.json()
+        if not isinstance(data, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Expected a JSON object.")
+        return await self.apply(cli.employee_update, request, request.params)
+
+    async def delete_employee(self, request):
+        return await self.apply(cli.employee_delete, request, request.params)
+
+    async def get_availability(self, request):
+        first_day = date.fromisoformat(request.query.get("from") or date.today().isoformat())
+        last_day = date.fromisoformat(request.query.get("to") or first_day.isoformat())
+        dates, eids, matrix = await self.run_db(availability_matrix, first_day, last_day)
+        return JSONResponse({"dates": dates, "eids": eids, "matrix": matrix})
+
+    async def set_availability(self, request):
+        items, _ = request.items()
+        return JSONResponse((await self.run_db(lambda: list(cli.availability_set(items))))[0])
+
+    async def list_schedule(self, request):
+        return StreamResponse(lambda: cli.schedule_view([request.query]))
+
+    async def set_schedule(self, request):
+        items, _ = request.items()
+        return JSONResponse((await self.run_db(lambda: list(cli.schedule_set(items))))[0])
+
+    async def punch(self, request):
+        # straight to the punch service, no pool thread waits on the commit
+        items, many = request.items()
+        service = get_punch_service()
+        pending = []
+        for item in items:
+            try:
+                eid = int(item["eid"])
+                action = PUNCH_ACTIONS[item.get("action", "")]
+            except (KeyError, TypeError, ValueError):
+                if not many:
+                    raise HTTPError(HTTPStatus.BAD_REQUEST, 'Expected {"eid": ID, "action": "in" or "out"}.')
+                pending.append((item, None, None))
+                continue
+            pending.append((item, action, asyncio.wrap_future(service.submit(eid, action))))
+
+        output = []
+        for item, action, future in pending:
+            if future is None:
+                output.append({"error": 'Expected {"eid": ID, "action": "in" or "out"}.', "input": item})
+                continue
+            try:
+                output.append({"eid": int(item["eid"]), "action": action, "timestamp": await future})
+            except sqlite3.IntegrityError:
+                if not many:
+                    raise HTTPError(HTTPStatus.NOT_FOUND, f"Employee with ID {item['eid']} not found!")
+                output.append({"error": f"Employee with ID {item['eid']} not found!", "input": item})
+            except Exception as e: # any other failure is that punch's error, not the whole batch's
+                if not many:
+                    raise
+                output.append({"error": cli.error_message(e), "input": item})
+        return JSONResponse(output if many else output[0], HTTPStatus.OK if many else HTTPStatus.CREATED)
+
+    async def get_hours(self, request):
+        return JSONResponse((await self.run_db(lambda: list(cli.hours([{**request.query, **request.params}]))))[0])
+
+    async def share_tips(self, request):
+        return await self.apply(cli.tips, request)
+
+    async def get_stats(self, request):
+        limit = int(request.query.get("limit") or 0) or None
+        return JSONResponse({**connection_stats(), "statements": query_stats(limit), "slow": slow_queries(),
+                             "punches": punch_stats()})
+
+    async def reset_stats(self, request):
+        reset_query_stats()
+        return JSONResponse({"reset": True})
+
+    # HTTP
+
+    def route(self, request):
+        allowed = []
+        for method, regex, handler in self.routes:
+            match = regex.match(request.path)
+            if match:
+                if method == request.method:
+                    request.params = {name: int(value) for name, value in match.groupdict().items()}
+                    return handler
+                allowed.append(method)
+        if allowed:
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f"Use {', '.join(allowed)} for {request.path}.")
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"No route for {request.path}.")
+
+    @staticmethod
+    def _head(status, keep_alive, headers):
+        status = HTTPStatus(status)
+        lines = [f"HTTP/1.1 {status.value} {status.phrase}", "Content-Type: application/json",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def send_json(self, writer, status, data, keep_alive):
+        body = json.dumps(data, default=str).encode()
+        writer.write(self._head(status, keep_alive, {"Content-Length": len(body)}) + body)
+        await writer.drain()
+
+    def _produce(self, loop, chunks, stop, rows):
+        # worker thread: serialise the rows in batches and hand them to the event loop, waiting
+        # while the client is STREAM_BUFFER chunks behind; an exception is passed on as the last chunk
+        def put(chunk):
+            asyncio.run_coroutine_threadsafe(chunks.put(chunk), loop).result()
+
+        iterator = None
+        try:
+            iterator = iter(rows())
+            batch = []
+            for row in iterator:
+                batch.append(json.dumps(row, default=str))
+                if len(batch) >= STREAM_BATCH:
+                    put(batch)
+                    batch = []
+                    if stop.is_set():
+                        return
+            put(batch)
+            put(None)
+        except Exception as e:
+            put(e)
+        finally:
+            if hasattr(iterator, "close"):
+                iterator.close() # closes the database cursor on this thread
+
+    async def send_stream(self, writer, rows, keep_alive):
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue(STREAM_BUFFER)
+        stop = threading.Event()
+        producer = loop.run_in_executor(self.executor, self._produce, loop, chunks, stop, rows)
+        try:
+            first = await chunks.get()
+            if isinstance(first, Exception): # failed before anything was sent, answer with an error status
+                await self.send_json(writer, _status(first), {"error": cli.error_message(first)}, keep_alive)
+                return
+            writer.write(self._head(HTTPStatus.OK, keep_alive, {"Transfer-Encoding": "chunked"}))
+            count = 0
+            chunk = first
+            while chunk is not None:
+                failed = isinstance(chunk, Exception)
+                if failed: # too late for an error status, end the array with the error instead
+                    chunk = [json.dumps({"error": cli.error_message(chunk)})]
+                if chunk:
+                    data = (("[\n" if count == 0 else ",\n") + ",\n".join(chunk)).encode()
+                    count += len(chunk)
+                    writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+                    await writer.drain()
+                chunk = None if failed else await chunks.get()
+            tail = b"\n]\n" if count else b"[]\n"
+            writer.write(b"%x\r\n%s\r\n0\r\n\r\n" % (len(tail), tail))
+            await writer.drain()
+        finally:
+            # a client that went away stops the producer; keep taking chunks until its thread is free
+            stop.set()
+            while not producer.done():
+                try:
+                    chunks.get_nowait()
+                except asyncio.QueueEmpty:
+                    await asyncio.sleep(0.001)
+
+    async def respond(self, request, writer, keep_alive):
+        try:
+            response = await self.route(request)(request)
+        except Exception as e:
+            await self.send_json(writer, _status(e), {"error": cli.error_message(e)}, keep_alive)
+            return
+        if isinstance(response, StreamResponse):
+            await self.send_stream(writer, response.rows, keep_alive)
+        else:
+            await self.send_json(writer, response.status, response.data, keep_alive)
+
+    async def handle(self, reader, writer):
+        # one client connection, requests are answered in order until it closes or goes idle
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEPALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError):
+                    break
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = request_line.split(" ")
+                    headers = {}
+                    for line in header_lines:
+                        if line:
+                            name, _, value = line.partition(":")
+                            headers[name.strip().lower()] = value.strip()
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    await self.send_json(writer, HTTPStatus.BAD_REQUEST, {"error": "Malformed request."}, False)
+                    break
+                if "chunked" in headers.get("transfer-encoding", ""):
+                    await self.send_json(writer, HTTPStatus.LENGTH_REQUIRED, {"error": "Send a Content-Length."}, False)
+                    break
+                if length > MAX_BODY:
+                    await self.send_json(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "Body too large."}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                await self.respond(Request(method, target, headers, body), writer, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8080, ready=None):
+        server = await asyncio.start_server(self.handle, host, port)
+        if ready:
+            ready(server)
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP/JSON API for the employee management system.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=WORKERS, help="threads running database work")
+    args = parser.parse_args(argv)
+    logging.basicConfig(format="%(asctime)s %(name)s %(levelname)s %(message)s") # slow queries go to stderr
+
+    def ready(server):
+        print(f"Serving on http://{args.host}:{server.sockets[0].getsockname()[1]}")
+
+    try:
+        asyncio.run(Server(args.workers).serve(args.host, args.port, ready))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+#bench.py
+# benchmarks for the hot paths, run against synthetic databases built in a temporary directory
+# every benchmark is timed call by call at each size, reporting latency percentiles, throughput and
+# the peak memory of one call (tracemalloc), and the results can be saved as JSON and compared later
+# usage: python bench.py run --sizes 100,1000,10000 --days 28 --output before.json
+#        python bench.py compare before.json after.json --threshold 10
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from database import DATABASE_FILE, close_connections, get_connection, register_schema
+from employee import employee_cache, get_employee, load_employees_from_database, save_employees_to_database, \
+    search_employees
+from schedule import iter_schedule
+from coverage import coverage_for_range
+from Attendance import TIME_FORMAT, to_epoch, calculate_hours, ewd, log_attendance, rebuild_hours_rollup
+from reports import payroll_report
+from punches import PunchService
+
+DEFAULT_SIZES = (100, 1000, 10000)
+DEFAULT_DAYS = 28
+SEED = 42
+
+FIRST_NAMES = ("Ann", "Bo", "Cy", "Dee", "Eli", "Fay", "Gus", "Hal", "Ida", "Jo", "Kim", "Lou", "Mo", "Ned", "Ola")
+LAST_NAMES = ("Smith", "Lee", "Patel", "Garcia", "Nguyen", "Brown", "Khan", "Silva", "Novak", "Ito", "Moreau")
+POSITIONS = ("Cook", "Server", "Host", "Cashier", "Manager", "Dishwasher")
+SHIFTS = {"morning": ("06:00", "12:00"), "evening": ("16:00", "22:00")}
+
+
+def build_database(employees, days, seed=SEED):
+    # fill the database in the current directory: employees, availability and schedule for the last
+    # `days` days, and a punch pair for 97% of the scheduled shifts (a few minutes off the schedule)
+    rng = random.Random(seed)
+    today = date.today()
+    dates = [today - timedelta(days=days - 1 - i) for i in range(days)]
+    connection = get_connection()
+    with connection:
+        connection.executemany(
+            "INSERT INTO employees (eid, fname, lname, pos, email, address, phone, date_joined, salary) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(eid, rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), rng.choice(POSITIONS), f"emp{eid}@example.com",
+              f"{eid} Main Street", f"555-{eid:06d}", "2020-01-01", round(rng.uniform(15, 40), 2))
+             for eid in range(1, employees + 1)])
+
+        availability = []
+        schedule = []
+        punches = []
+        for day in dates:
+            midnight = datetime(day.year, day.month, day.day)
+            for eid in range(1, employees + 1):
+                shift = rng.choice(("morning", "evening", "both", None))
+                if shift is None:
+                    continue
+                availability.append((day.isoformat(), eid, shift if shift != "evening" else "",
+                                     shift if shift != "morning" else ""))
+                worked = rng.choice(("morning", "evening")) if shift == "both" else shift
+                start, end = SHIFTS[worked]
+                schedule.append((day.isoformat(), eid, *((start, end, "", "") if worked == "morning" else ("", "", start, end))))
+                if rng.random() < 0.03: # no-show
+                    continue
+                for action, text in (("Punch-In", start), ("Punch-Out", end)):
+                    hour, minute = map(int, text.split(":"))
+                    moment = midnight + timedelta(hours=hour, minutes=minute + rng.randint(-10, 10))
+                    punches.append((eid, action, moment.strftime(TIME_FORMAT), to_epoch(moment)))
+
+        connection.executemany("INSERT INTO availability VALUES (?, ?, ?, ?)", availability)
+        connection.executemany("INSERT INTO schedule VALUES (?, ?, ?, ?, ?, ?)", schedule)
+        connection.executemany("INSERT INTO attendance (eid, action, timestamp, epoch) VALUES (?, ?, ?, ?)", punches)
+    rebuild_hours_rollup()
+    return {"employees": employees, "days": days, "availability": len(availability), "schedule": len(schedule),
+            "punches": len(punches), "dates": dates}
+
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def measure(name, size, fn, calls, rows=None):
+    # time `calls` calls of fn(i) after one warm-up call, then one more call under tracemalloc
+    # rows: items handled per call, for a rows/s figure
+    fn(0)
+    latencies = []
+    started = time.perf_counter()
+    for i in range(calls):
+        t = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    fn(calls)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    result = {"name": name, "size": size, "calls": calls,
+              "mean_ms": round(elapsed / calls * 1000, 4),
+              "p50_ms": round(_percentile(latencies, 0.50) * 1000, 4),
+              "p90_ms": round(_percentile(latencies, 0.90) * 1000, 4),
+              "p99_ms": round(_percentile(latencies, 0.99) * 1000, 4),
+              "max_ms": round(latencies[-1] * 1000, 4),
+              "ops_per_s": round(calls / elapsed, 1),
+              "peak_kb": round(peak / 1024, 1)}
+    if rows is not None:
+        result["rows_per_s"] = round(rows * calls / elapsed, 1)
+    return result
+
+
+def benchmarks(info, repeat, rng):
+    # (name, fn(i), calls, rows per call) for every hot path
+    size = info["employees"]
+    dates = info["dates"]
+    full_scans = max(3, min(repeat, 200000 // size))
+    eids = [rng.randint(1, size) for _ in range(max(repeat, full_scans) + 2)]
+    days = [rng.choice(dates) for _ in range(max(repeat, full_scans) + 2)]
+    staff = load_employees_from_database()
+    dirty = max(1, size // 100)
+
+    def save(i):
+        for emp in rng.sample(staff, dirty):
+            emp.phone = f"555-{i:06d}"
+        save_employees_to_database(staff)
+
+    def get_cold(i):
+        employee_cache.invalidate(eids[i])
+        get_employee(eids[i])
+
+    service = PunchService().start()
+
+    def punch_batch(i):
+        futures = [service.submit(eid, "Punch-In" if i % 2 == 0 else "Punch-Out") for eid in range(1, min(size, 500) + 1)]
+        for future in futures:
+            future.result()
+
+    return service, [
+        ("load_employees_from_database", lambda i: load_employees_from_database(), full_scans, size),
+        ("save_employees_to_database (1% changed)", save, full_scans, dirty),
+        ("get_employee (cache miss)", get_cold, repeat, 1),
+        ("get_employee (cached)", lambda i: get_employee(eids[i]), repeat, 1),
+        ("search_employees (last name prefix)", lambda i: list(search_employees(lname="Sm")), full_scans, None),
+        ("calculate_hours (recent)", lambda i: calculate_hours({"eid": eids[i]}, "recent"), repeat, 1),
+        ("calculate_hours (weekly)", lambda i: calculate_hours({"eid": eids[i]}, "weekly"), repeat, 1),
+        ("calculate_hours (monthly)", lambda i: calculate_hours({"eid": eids[i]}, "monthly"), repeat, 1),
+        ("ewd (one hour window)", lambda i: ewd(9, 0, 10, 0, days[i]), repeat, None),
+        ("view_schedule_for_date (hourly grid)", lambda i: coverage_for_range(days[i], days[i], 60), repeat, None),
+        ("coverage grid (whole range, 15 min)", lambda i: coverage_for_range(dates[0], dates[-1], 15), full_scans, None),
+        ("iter_schedule (one employee, whole range)", lambda i: list(iter_schedule(eid=eids[i])), repeat, None),
+        ("payroll_report (whole range)", lambda i: payroll_report(dates[0], dates[-1]), full_scans, size),
+        ("log_attendance", lambda i: log_attendance({"eid": eids[i]}, "Punch-In" if i % 2 == 0 else "Punch-Out"), repeat, 1),
+        ("punch service (batch of up to 500)", punch_batch, max(3, repeat // 20), min(size, 500)),
+    ]
+
+
+def run_size(size, days, repeat, only=None, progress=print):
+    # build a fresh database for one size in a temporary directory and run every benchmark on it
+    previous = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="ems-bench-") as directory:
+        os.chdir(directory)
+        close_connections()
+        register_schema(DATABASE_FILE) # no new statements, just run the schema again for the new file
+        employee_cache.invalidate()
+        try:
+            started = time.perf_counter()
+            info = build_database(size, days)
+            progress(f"{size} employees: built {info['schedule']} shifts and {info['punches']} punches "
+                     f"in {time.perf_counter() - started:.1f}s")
+            service, cases = benchmarks(info, repeat, random.Random(SEED))
+            results = []
+            try:
+                for name, fn, calls, rows in cases:
+                    if only and not any(word.lower() in name.lower() for word in only):
+                        continue
+                    result = measure(name, size, fn, calls, rows)
+                    progress(f"  {name:<45} p50 {result['p50_ms']:>10.3f} ms  p99 {result['p99_ms']:>10.3f} ms  "
+                             f"{result['ops_per_s']:>10.1f}/s  peak {result['peak_kb']:>9.1f} KiB")
+                    results.append(result)
+            finally:
+                service.stop()
+        finally:
+            close_connections()
+            os.chdir(previous)
+            register_schema(DATABASE_FILE)
+            employee_cache.invalidate()
+    return results
+
+
+def run(sizes=DEFAULT_SIZES, days=DEFAULT_DAYS, repeat=200, only=None, progress=print):
+    results = []
+    for size in sizes:
+        results.extend(run_size(size, days, repeat, only, progress))
+    return {"created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(), "sqlite": sqlite3.sqlite_version, "platform": platform.platform(),
+            "config": {"sizes": list(sizes), "days": days, "repeat": repeat, "seed": SEED},
+            "results": results}
+
+
+def compare(base, new, threshold=10.0, metric="p50_ms"):
+    # rows of (name, size, base value, new value, change %) and whether any got slower than threshold %
+    old = {(r["name"], r["size"]): r for r in base["results"]}
+    rows = []
+    regressed = False
+    for result in new["results"]:
+        before = old.get((result["name"], result["size"]))
+        if before is None or not before[metric]:
+            continue
+        change = (result[metric] - before[metric]) / before[metric] * 100
+        slower = change > threshold
+        regressed = regressed or slower
+        rows.append((result["name"], result["size"], before[metric], result[metric], change, slower))
+    return rows, regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for the employee management system.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="build synthetic databases and time the hot paths")
+    run_parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="employee counts, e.g. 100,1000")
+    run_parser.add_argument("--days", type=int, default=DEFAULT_DAYS, help="days of availability, schedule and punches")
+    run_parser.add_argument("--repeat", type=int, default=200, help="calls per benchmark for the per-employee paths")
+    run_parser.add_argument("--only", action="append", help="run only benchmarks whose name contains this")
+    run_parser.add_argument("--output", help="save the results as JSON")
+    compare_parser = commands.add_parser("compare", help="compare two saved runs")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=10.0, help="percent slower that counts as a regression")
+    compare_parser.add_argument("--metric", default="p50_ms", choices=["mean_ms", "p50_ms", "p90_ms", "p99_ms", "peak_kb"])
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        report = run([int(size) for size in args.sizes.split(",")], args.days, args.repeat, args.only)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            print(f"Results saved to {args.output}.")
+        return 0
+
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    rows, regressed = compare(base, new, args.threshold, args.metric)
+    for name, size, before, after, change, slower in rows:
+        print(f"{name:<45} {size:>7}  {before:>10.3f} -> {after:>10.3f} {args.metric}  {change:+7.1f}%"
+              f"{'  SLOWER' if slower else ''}")
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
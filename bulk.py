@@ -0,0 +1,240 @@
+#bulk.py
+# import and export employees, availability and schedules as CSV, JSON or NDJSON
+# rows are streamed from the file, checked a chunk at a time and written one transaction per chunk
+# usage: python bulk.py import employees employees.json --errors rejected.ndjson
+#        python bulk.py export schedule schedule.csv
+import argparse
+import csv
+import json
+from datetime import date
+from database import get_connection
+from employee import Employee, EMPLOYEE_COLUMNS, UPSERT_QUERY, employee_cache, existing_eids
+from schedule import check_shift
+
+CHUNK_SIZE = 5000
+
+AVAILABILITY_COLUMNS = ("date", "eid", "morning_availability", "evening_availability")
+SCHEDULE_COLUMNS = ("date", "eid", "morning_start", "morning_end", "evening_start", "evening_end")
+
+
+def _file_format(path, fmt=None):
+    if fmt:
+        return fmt
+    if path.endswith(".csv"):
+        return "csv"
+    if path.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return "json"
+
+
+def _flatten_day_file(data, entity):
+    # employee_schedule.json layout: {date: {"availability": {eid: shift}, "morning_schedule": {eid: {start, end}}, ...}}
+    for day, entry in data.items():
+        if entity == "availability":
+            for eid, shift in entry.get("availability", {}).items():
+                yield {"date": day, "eid": eid, "shift": shift}
+        elif entity == "schedule":
+            rows = {}
+            for shift in ("morning", "evening"):
+                for eid, times in entry.get(f"{shift}_schedule", {}).items():
+                    row = rows.setdefault(eid, {"date": day, "eid": eid})
+                    row[f"{shift}_start"] = times.get("start", "")
+                    row[f"{shift}_end"] = times.get("end", "")
+            yield from rows.values()
+
+
+def read_rows(path, entity, fmt=None):
+    # yield one dict per row of the file
+    fmt = _file_format(path, fmt)
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        elif fmt == "ndjson":
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            data = json.load(f)
+            if isinstance(data, dict):
+                yield from _flatten_day_file(data, entity)
+            else:
+                yield from data
+
+
+def _text(value):
+    return "" if value is None else str(value).strip()
+
+
+def _iso_date(value):
+    return date.fromisoformat(_text(value)).isoformat()
+
+
+def _time(value):
+    # "HH:MM" or "" for no shift
+    value = _text(value)
+    if value == "" or value.lower() == "none":
+        return ""
+    hour, minute = map(int, value.split(":"))
+    if not (0 <= hour and 0 <= minute < 60 and (hour, minute) <= (24, 0)):
+        raise ValueError(f"Invalid time {value!r}")
+    return f"{hour:02d}:{minute:02d}"
+
+
+def _employee_row(row):
+    email = _text(row.get("email"))
+    if not Employee.validate_email(email):
+        raise ValueError("Invalid email format.")
+    joined = _text(row.get("date_joined"))
+    joined = date.fromisoformat(joined) if joined else date.today()
+    if joined > date.today():
+        raise ValueError("Date of joining cannot be in the future.")
+    salary = _text(row.get("salary")) or "0"
+    return (int(row["eid"]), _text(row.get("fname")), _text(row.get("lname")), _text(row.get("pos")), email,
+            _text(row.get("address")), _text(row.get("phone")), joined.isoformat(), round(float(salary), 2))
+
+
+def _availability_row(row):
+    if "shift" in row:
+        shift = _text(row["shift"]).lower()
+        if shift not in ("morning", "evening", "both"):
+            raise ValueError("Shift must be 'morning', 'evening' or 'both'.")
+        morning = shift if shift in ("morning", "both") else ""
+        evening = shift if shift in ("evening", "both") else ""
+    else:
+        morning = _text(row.get("morning_availability"))
+        evening = _text(row.get("evening_availability"))
+    return (_iso_date(row["date"]), int(row["eid"]), morning, evening)
+
+
+def _schedule_row(row):
+    # each shift within its own hours, both times or neither and ending after it starts
+    morning = check_shift(_time(row.get("morning_start")), _time(row.get("morning_end")), "morning")
+    evening = check_shift(_time(row.get("evening_start")), _time(row.get("evening_end")), "evening")
+    return (_iso_date(row["date"]), int(row["eid"]), *morning, *evening)
+
+
+ENTITIES = {
+    # entity: (table, columns, row check, write statement)
+    "employees": ("employees", EMPLOYEE_COLUMNS, _employee_row, UPSERT_QUERY),
+    "availability": ("availability", AVAILABILITY_COLUMNS, _availability_row,
+                     "INSERT OR REPLACE INTO availability (date, eid, morning_availability, evening_availability) VALUES (?, ?, ?, ?)"),
+    "schedule": ("schedule", SCHEDULE_COLUMNS, _schedule_row,
+                 "INSERT OR REPLACE INTO schedule (date, eid, morning_start, morning_end, evening_start, evening_end) VALUES (?, ?, ?, ?, ?, ?)"),
+}
+
+
+def _write_chunk(entity, chunk, errors):
+    # check a chunk of (line number, row) pairs and write the good rows in one transaction
+    _, _, check, statement = ENTITIES[entity]
+    good = []
+    for line, row in chunk:
+        if not isinstance(row, dict): # e.g. a number or a list in a JSON file
+            errors.append({"line": line, "error": "Expected an object with the row's columns.", "row": row})
+            continue
+        try:
+            good.append((line, row, check(row)))
+        except (KeyError, TypeError, ValueError) as e:
+            errors.append({"line": line, "error": str(e) or f"Missing {e}", "row": row})
+
+    connection = get_connection()
+    with connection:
+        cursor = connection.cursor()
+        if entity != "employees":
+            known = existing_eids([values[1] for _, _, values in good]) # one query for the whole chunk
+            missing = [item for item in good if item[2][1] not in known]
+            for line, row, values in missing:
+                errors.append({"line": line, "error": f"Employee ID {values[1]} does not exist.", "row": row})
+            good = [item for item in good if item[2][1] in known]
+        cursor.executemany(statement, [values for _, _, values in good])
+    return len(good)
+
+
+def import_file(entity, path, fmt=None, chunk_size=CHUNK_SIZE, errors_path=None, progress=print):
+    # returns {"read": n, "written": n, "rejected": n}; rejected rows go to errors_path as NDJSON
+    if entity not in ENTITIES:
+        raise ValueError(f"Unknown entity {entity!r}")
+    summary = {"read": 0, "written": 0, "rejected": 0}
+    error_file = open(errors_path, "w", encoding="utf-8") if errors_path else None
+    try:
+        chunk = []
+        for line, row in enumerate(read_rows(path, entity, fmt), 1):
+            chunk.append((line, row))
+            if len(chunk) >= chunk_size:
+                _flush(entity, chunk, summary, error_file, progress)
+                chunk = []
+        if chunk:
+            _flush(entity, chunk, summary, error_file, progress)
+    finally:
+        if error_file:
+            error_file.close()
+        if entity == "employees":
+            employee_cache.invalidate()
+    return summary
+
+
+def _flush(entity, chunk, summary, error_file, progress):
+    errors = []
+    summary["read"] += len(chunk)
+    summary["written"] += _write_chunk(entity, chunk, errors)
+    summary["rejected"] += len(errors)
+    if error_file:
+        for error in errors:
+            error_file.write(json.dumps(error, default=str) + "\n")
+    if progress:
+        progress(f"{entity}: {summary['read']} read, {summary['written']} written, {summary['rejected']} rejected")
+
+
+def export_file(entity, path, fmt=None, chunk_size=CHUNK_SIZE):
+    # write every row of the entity's table to path, returns the number of rows written
+    if entity not in ENTITIES:
+        raise ValueError(f"Unknown entity {entity!r}")
+    table, columns, _, _ = ENTITIES[entity]
+    fmt = _file_format(path, fmt)
+    cursor = get_connection().cursor()
+    cursor.execute("SELECT {} FROM {} ORDER BY {}".format(", ".join(columns), table,
+                                                         "eid" if entity == "employees" else "date, eid"))
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f) if fmt == "csv" else None
+        if writer:
+            writer.writerow(columns)
+        elif fmt == "json":
+            f.write("[")
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            for row in rows:
+                if writer:
+                    writer.writerow(row)
+                elif fmt == "json":
+                    f.write((",\n" if count else "\n") + json.dumps(dict(zip(columns, row))))
+                else:
+                    f.write(json.dumps(dict(zip(columns, row))) + "\n")
+                count += 1
+        if fmt == "json":
+            f.write("\n]\n")
+    cursor.close()
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import and export for the employee management system.")
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("entity", choices=sorted(ENTITIES))
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "json", "ndjson"], help="default: from the file extension")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--errors", help="file for rejected rows (NDJSON)")
+    args = parser.parse_args(argv)
+
+    if args.action == "import":
+        summary = import_file(args.entity, args.path, args.format, args.chunk_size, args.errors)
+        print(f"Imported {summary['written']} of {summary['read']} {args.entity} rows ({summary['rejected']} rejected).")
+    else:
+        count = export_file(args.entity, args.path, args.format, args.chunk_size)
+        print(f"Exported {count} {args.entity} rows to {args.path}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# cache.py
+# small in-process LRU cache shared by the modules that look up the same rows again and again
+from collections import OrderedDict
+import threading
+
+
+class LRUCache:
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._generation = 0 # bumped by every invalidate
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key) # most recently used goes to the end
+            self.hits += 1
+            return value
+
+    def generation(self):
+        # read it before loading a value and pass it to put, so a value read before a concurrent
+        # invalidate is not put back afterwards
+        with self._lock:
+            return self._generation
+
+    def put(self, key, value, generation=None):
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return # something was invalidated since the value was read, it may be stale
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False) # drop the least recently used
+
+    def invalidate(self, key=None):
+        # forget one key, or everything when no key is given
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,312 @@
+#cli.py
+# command line entry points for every menu operation, for cron jobs and shell pipelines
+# every command prints JSON; with --json it reads its input from stdin instead of the flags
+# (one JSON object, a JSON array of objects or one object per line) and runs the whole batch in one process
+# usage: python cli.py employee add --eid 7 --fname Ann --lname Lee --pos Cook --email ann@example.com
+#        echo '[{"eid": 7, "pos": "Chef"}, {"eid": 8, "phone": "555-0100"}]' | python cli.py employee update --json
+#        python cli.py punch in 7 8 9
+#        python cli.py hours 7 --from 2024-05-01 --to 2024-05-31
+#        python cli.py --stats schedule view --from 2024-05-01   (query timings on stderr afterwards)
+import argparse
+import json
+import sys
+from datetime import date
+from database import execute_query, dump_query_stats
+from employee import Employee, EDITABLE_FIELDS, employee_cache, get_employee, patch_employee, remove_employee, \
+    search_employees
+from schedule import set_availability_bulk, set_schedule_bulk, iter_schedule
+from Attendance import log_attendance, calculate_hours, hours_between
+from tips import distribute_tips
+
+EMPLOYEE_FILTERS = ("fname", "lname", "pos", "email", "joined_from", "joined_to", "text")
+DATE_FILTERS = ("joined_from", "joined_to")
+HOURS_MODES = ("recent", "weekly", "monthly")
+SCHEDULE_FIELDS = ("date", "eid", "morning_start", "morning_end", "evening_start", "evening_end")
+
+
+def _employee_json(emp):
+    return {**emp.to_dict(), "date_joined": str(emp.date_joined)}
+
+
+def _shift_times(item, shift):
+    # "morning": "09:00-12:00" or morning_start/morning_end
+    if item.get(shift):
+        start, _, end = item[shift].partition("-")
+        return start, end
+    return item.get(f"{shift}_start", ""), item.get(f"{shift}_end", "")
+
+
+def _day(value):
+    return date.fromisoformat(str(value)) if value else None
+
+
+# each command takes the list of input objects and yields one result per object
+# (or the rows found, for the view commands); an error becomes {"error": ...} for that object
+# bad input raises ValueError, KeyError or TypeError, an unknown employee LookupError
+
+def employee_add(items):
+    for item in items:
+        eid = int(item["eid"])
+        if get_employee(eid) is not None:
+            raise ValueError(f"An employee with ID {eid} already exists!")
+        emp = Employee(eid, item.get("fname", ""), item.get("lname", ""), item.get("pos", ""), item.get("email", ""),
+                       item.get("address", ""), item.get("phone", ""), salary=item.get("salary", 0))
+        if item.get("date_joined"):
+            emp.date_joined = _day(item["date_joined"])
+        execute_query("INSERT INTO employees VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                      (emp.eid, emp.fname, emp.lname, emp.pos, emp.email, emp.address, emp.phone,
+                       str(emp.date_joined), emp.salary))
+        employee_cache.invalidate(eid)
+        yield _employee_json(emp)
+
+
+def employee_update(items):
+    for item in items:
+        fields = {name: value for name, value in item.items() if name in EDITABLE_FIELDS and value is not None}
+        emp = patch_employee(int(item["eid"]), **fields)
+        if emp is None:
+            raise LookupError(f"Employee with ID {item['eid']} not found!")
+        yield _employee_json(emp)
+
+
+def employee_delete(items):
+    for item in items:
+        emp = remove_employee(int(item["eid"]))
+        if emp is None:
+            raise LookupError(f"Employee with ID {item['eid']} not found!")
+        yield {"deleted": int(item["eid"])}
+
+
+def employee_view(items):
+    for item in items:
+        if item.get("eid") is not None:
+            emp = get_employee(int(item["eid"]))
+            if emp is None:
+                raise LookupError(f"Employee with ID {item['eid']} not found!")
+            yield _employee_json(emp)
+        else:
+            filters = {name: item.get(name) for name in EMPLOYEE_FILTERS}
+            for name in DATE_FILTERS: # compared as text in the query, so a bad date would just match nothing
+                filters[name] = _day(filters[name])
+            for emp in search_employees(**filters):
+                yield _employee_json(emp)
+
+
+def availability_set(items):
+    # one transaction for the whole batch
+    written, unknown = set_availability_bulk([(item["date"], int(item["eid"]), item["shift"]) for item in items])
+    yield {"written": written, "unknown_eids": unknown}
+
+
+def schedule_set(items):
+    entries = [(item["date"], int(item["eid"]), *_shift_times(item, "morning"), *_shift_times(item, "evening"))
+               for item in items]
+    written, unknown = set_schedule_bulk(entries)
+    yield {"written": written, "unknown_eids": unknown}
+
+
+def schedule_view(items):
+    for item in items:
+        eid = item.get("eid")
+        for row in iter_schedule(_day(item.get("from")), _day(item.get("to")), int(eid) if eid is not None else None):
+            yield {"date": row[0], "eid": row[1], "name": row[2], **dict(zip(SCHEDULE_FIELDS[2:], row[3:]))}
+
+
+def _punch(action):
+    def punch(items):
+        for item in items:
+            eid = int(item["eid"])
+            if get_employee(eid) is None:
+                raise LookupError(f"Employee with ID {eid} not found!")
+            yield {"eid": eid, "action": action, "timestamp": log_attendance({"eid": eid}, action)}
+    return punch
+
+
+def hours(items):
+    for item in items:
+        eid = int(item["eid"])
+        if item.get("from") or item.get("to"):
+            first_day = _day(item.get("from")) or date.min
+            last_day = _day(item.get("to")) or date.today()
+            yield {"eid": eid, "from": str(first_day), "to": str(last_day),
+                   "hours": round(hours_between(eid, first_day, last_day), 2)}
+        else:
+            mode = item.get("mode") or "recent"
+            if mode not in HOURS_MODES: # calculate_hours treats any other mode as recent
+                raise ValueError(f"Unknown mode {mode!r}, use {', '.join(HOURS_MODES)}.")
+            yield {"eid": eid, "mode": mode, "hours": round(calculate_hours({"eid": eid}, mode), 2)}
+
+
+def _window(window):
+    # "11-15=120.50", [start, end, amount] or {"start", "end", "amount"}
+    if isinstance(window, str):
+        times, _, amount = window.partition("=")
+        start, _, end = times.partition("-")
+        return start, end, float(amount)
+    if isinstance(window, dict):
+        return window["start"], window["end"], float(window["amount"])
+    start, end, amount = window
+    return start, end, float(amount)
+
+
+def tips(items):
+    for item in items:
+        day = _day(item.get("date")) or date.today()
+        results = distribute_tips(day, [_window(window) for window in item["windows"]])
+        yield {"date": str(day), "windows": results}
+
+
+COMMANDS = {
+    ("employee", "add"): employee_add,
+    ("employee", "update"): employee_update,
+    ("employee", "delete"): employee_delete,
+    ("employee", "view"): employee_view,
+    ("availability", "set"): availability_set,
+    ("schedule", "set"): schedule_set,
+    ("schedule", "view"): schedule_view,
+    ("punch", "in"): _punch("Punch-In"),
+    ("punch", "out"): _punch("Punch-Out"),
+    ("hours", None): hours,
+    ("tips", None): tips,
+}
+
+
+def read_stdin(stream=None):
+    # one JSON object, a JSON array, or one JSON object per line
+    text = (stream or sys.stdin).read().strip()
+    if not text:
+        return []
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    return data if isinstance(data, list) else [data]
+
+
+def _items_from_flags(args):
+    # flags become one input object, several positional IDs become one object each
+    item = {name: value for name, value in vars(args).items()
+            if name not in ("group", "action", "json", "eids", "stats") and value is not None}
+    eids = getattr(args, "eids", None)
+    if eids:
+        return [{**item, "eid": eid} for eid in eids]
+    return [item]
+
+
+def error_message(e):
+    return f"Missing {e}" if isinstance(e, KeyError) else str(e)
+
+
+def results(command, items):
+    # run each input object on its own so one bad row doesn't stop the batch,
+    # a failing object yields {"error": ..., "input": ...} in its place
+    for item in items:
+        try:
+            yield from command([item])
+        except Exception as e: # bad input, or e.g. sqlite3.IntegrityError
+            yield {"error": error_message(e), "input": item}
+
+
+def run(command, items, out):
+    # write the results as a JSON array as they are produced, returns the number of errors
+    errors = 0
+    first = True
+    out.write("[")
+    for result in results(command, items):
+        out.write(("\n" if first else ",\n") + json.dumps(result, default=str))
+        first = False
+        errors += "error" in result
+    out.write("]\n" if first else "\n]\n")
+    return errors
+
+
+def run_batch(command, items, out):
+    # commands that write a whole batch in one transaction get every input object at once
+    try:
+        output = list(command(items))
+    except Exception as e:
+        output = [{"error": error_message(e)}]
+    out.write(json.dumps(output, default=str) + "\n")
+    return sum(1 for result in output if "error" in result)
+
+
+BATCH_COMMANDS = {("availability", "set"), ("schedule", "set")}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Command line interface for the employee management system.")
+    parser.add_argument("--stats", action="store_true", help="print per-statement query timings to stderr")
+    groups = parser.add_subparsers(dest="group", required=True)
+
+    def command(parent, name, help_text):
+        sub = parent.add_parser(name, help=help_text)
+        sub.add_argument("--json", action="store_true", help="read the input objects from stdin")
+        return sub
+
+    employee = groups.add_parser("employee", help="add, update, delete or view employees")
+    actions = employee.add_subparsers(dest="action", required=True)
+    for name in ("add", "update"):
+        sub = command(actions, name, f"{name} an employee")
+        sub.add_argument("--eid", type=int)
+        for field in ("fname", "lname", "pos", "email", "address", "phone", "salary", "date_joined"):
+            sub.add_argument(f"--{field.replace('_', '-')}", dest=field)
+    sub = command(actions, "delete", "delete employees")
+    sub.add_argument("eids", nargs="*", type=int)
+    sub = command(actions, "view", "one employee by ID, or search")
+    sub.add_argument("--eid", type=int)
+    for field in EMPLOYEE_FILTERS:
+        sub.add_argument(f"--{field.replace('_', '-')}", dest=field)
+
+    availability = groups.add_parser("availability", help="set availability")
+    actions = availability.add_subparsers(dest="action", required=True)
+    sub = command(actions, "set", "set availability for a date")
+    sub.add_argument("--date")
+    sub.add_argument("--eid", type=int)
+    sub.add_argument("--shift", choices=["morning", "evening", "both"])
+
+    schedule = groups.add_parser("schedule", help="set or view the schedule")
+    actions = schedule.add_subparsers(dest="action", required=True)
+    sub = command(actions, "set", "set an employee's shifts for a date")
+    sub.add_argument("--date")
+    sub.add_argument("--eid", type=int)
+    sub.add_argument("--morning", help="HH:MM-HH:MM")
+    sub.add_argument("--evening", help="HH:MM-HH:MM")
+    sub = command(actions, "view", "schedule for a date range and/or an employee")
+    sub.add_argument("--from", dest="from")
+    sub.add_argument("--to", dest="to")
+    sub.add_argument("--eid", type=int)
+
+    punch = groups.add_parser("punch", help="punch in or out")
+    actions = punch.add_subparsers(dest="action", required=True)
+    for name in ("in", "out"):
+        sub = command(actions, name, f"punch {name}")
+        sub.add_argument("eids", nargs="*", type=int)
+
+    sub = command(groups, "hours", "hours worked")
+    sub.add_argument("eids", nargs="*", type=int)
+    sub.add_argument("--mode", choices=HOURS_MODES)
+    sub.add_argument("--from", dest="from")
+    sub.add_argument("--to", dest="to")
+
+    sub = command(groups, "tips", "share the tips of a day's service windows")
+    sub.add_argument("--date")
+    sub.add_argument("--window", dest="windows", action="append", help="START-END=AMOUNT, e.g. 11-15=120.50")
+    return parser
+
+
+def main(argv=None, stdin=None, out=None):
+    args = build_parser().parse_args(argv)
+    out = out or sys.stdout
+    key = (args.group, getattr(args, "action", None))
+    items = read_stdin(stdin) if args.json else _items_from_flags(args)
+    if key in BATCH_COMMANDS:
+        errors = run_batch(COMMANDS[key], items, out)
+    else:
+        errors = run(COMMANDS[key], items, out)
+    if args.stats:
+        dump_query_stats(sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
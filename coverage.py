@@ -0,0 +1,88 @@
+#coverage.py
+# who is scheduled in every time slot of a day, at 15, 30 or 60 minute granularity
+# each employee's day is a bytearray with one cell per slot filled by slice assignment, and the
+# headcount per slot comes from a difference array summed with accumulate, so the work is per shift
+# and per slot instead of per shift times per slot
+from datetime import timedelta
+from itertools import accumulate
+from database import get_connection
+
+GRANULARITIES = (15, 30, 60)
+DAY_MINUTES = 24 * 60
+
+def to_minutes(time_str):
+    # "HH:MM" -> minutes after midnight, None for an empty or 'none' time
+    if not time_str or time_str.lower() == 'none':
+        return None
+    hour, minute = map(int, time_str.split(':'))
+    return hour * 60 + minute
+
+def slot_labels(granularity=60):
+    labels = []
+    for start in range(0, DAY_MINUTES, granularity):
+        end = start + granularity
+        labels.append(f"{start // 60:02d}:{start % 60:02d}-{end // 60:02d}:{end % 60:02d}")
+    return labels
+
+# schedule rows (date, eid, morning_start, morning_end, evening_start, evening_end) -> (date, eid, start, end) in minutes
+def schedule_intervals(rows):
+    for day, eid, *times in rows:
+        for start, end in ((times[0], times[1]), (times[2], times[3])):
+            start, end = to_minutes(start), to_minutes(end)
+            if start is not None and end is not None and end > start:
+                yield day, eid, start, min(end, DAY_MINUTES)
+
+# fill the grid for a set of schedule rows
+# returns {"slots": labels, "grid": {date: {eid: bytearray}}, "headcount": {date: [count per slot]}}
+# grid cells are 1 when the employee is on shift for any part of the slot
+def coverage_grid(rows, granularity=60):
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Granularity must be one of {GRANULARITIES} minutes.")
+    slots = DAY_MINUTES // granularity
+    spans = {}
+    for day, eid, start, end in schedule_intervals(rows):
+        # round the end up, a partly covered slot counts
+        spans.setdefault((day, eid), []).append((start // granularity, -(-end // granularity)))
+
+    grid = {}
+    changes = {}
+    for (day, eid), ranges in spans.items():
+        cells = grid.setdefault(day, {}).setdefault(eid, bytearray(slots))
+        diff = changes.setdefault(day, [0] * (slots + 1))
+        # merge the employee's shifts first so touching or overlapping shifts count them once per slot
+        ranges.sort()
+        merged = [list(ranges[0])]
+        for first, last in ranges[1:]:
+            if first <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], last)
+            else:
+                merged.append([first, last])
+        for first, last in merged:
+            cells[first:last] = b"\x01" * (last - first)
+            diff[first] += 1
+            diff[last] -= 1
+
+    headcount = {day: list(accumulate(diff[:slots])) for day, diff in changes.items()}
+    return {"slots": slot_labels(granularity), "grid": grid, "headcount": headcount}
+
+# coverage for every day from first_day to last_day, with the employees' first names
+def coverage_for_range(first_day, last_day, granularity=60):
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT s.date, s.eid, s.morning_start, s.morning_end, s.evening_start, s.evening_end, e.fname
+            FROM schedule s JOIN employees e ON e.eid = s.eid
+            WHERE s.date BETWEEN ? AND ?
+            ORDER BY s.date, s.eid
+        """, (first_day.isoformat(), last_day.isoformat()))
+        rows = cursor.fetchall()
+
+    coverage = coverage_grid((row[:6] for row in rows), granularity)
+    coverage["names"] = {row[1]: row[6] for row in rows}
+    days = []
+    day = first_day
+    while day <= last_day:
+        days.append(day.isoformat())
+        day += timedelta(days=1)
+    coverage["days"] = days
+    return coverage
@@ -1,44 +1,505 @@
 # database.py
+# every table lives in one SQLite file so reports can JOIN employees in a single query
+import os
 import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections import deque
 
-DATABASE_FILE = "employees.db"
+DATABASE_FILE = "ems.db"
+# the old one-file-per-table databases, copied into DATABASE_FILE the first time it is opened
+LEGACY_DATABASE_FILES = ("employees.db", "availability.db", "schedule.db", "attendance.db")
+STATEMENT_CACHE_SIZE = 256  # prepared statements kept per connection
+BUSY_TIMEOUT = 5.0  # seconds a writer waits for another connection's lock before "database is locked"
 
-def create_tables():
-    # make the connection with database file
-    with sqlite3.connect(DATABASE_FILE) as connection:
-        cursor = connection.cursor()
+EMPLOYEES_TABLE = """
+    CREATE TABLE IF NOT EXISTS employees (
+        eid INTEGER PRIMARY KEY,
+        fname TEXT,
+        lname TEXT,
+        pos TEXT,
+        email TEXT,
+        address TEXT,
+        phone TEXT,
+        date_joined DATE DEFAULT CURRENT_DATE,
+        salary REAL
+    )
+"""
 
-        # Create employees table if not exists
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS employees (
-                eid INTEGER PRIMARY KEY,
-                fname TEXT,
-                lname TEXT,
-                pos TEXT,
-                email TEXT,
-                address TEXT,
-                phone TEXT,
-                date_joined DATE DEFAULT CURRENT_DATE,
-                salary REAL
-            )
-        """)
+MANAGERS_TABLE = """
+    CREATE TABLE IF NOT EXISTS managers (
+        username TEXT PRIMARY KEY,
+        password TEXT
+    )
+"""
+
+AVAILABILITY_TABLE = """
+    CREATE TABLE IF NOT EXISTS availability (
+        date TEXT,
+        eid INTEGER,
+        morning_availability TEXT,
+        evening_availability TEXT,
+        PRIMARY KEY (date, eid),
+        FOREIGN KEY (eid) REFERENCES employees(eid) ON DELETE RESTRICT
+    )
+"""
+
+SCHEDULE_TABLE = """
+    CREATE TABLE IF NOT EXISTS schedule (
+        date TEXT NOT NULL,
+        eid INTEGER NOT NULL,
+        morning_start TEXT,
+        morning_end TEXT,
+        evening_start TEXT,
+        evening_end TEXT,
+        PRIMARY KEY (date, eid),
+        FOREIGN KEY (eid) REFERENCES employees(eid) ON DELETE RESTRICT
+    )
+"""
+
+# the primary key serves lookups by date, this one serves one employee's schedule over a range of dates
+SCHEDULE_INDEX = "CREATE INDEX IF NOT EXISTS idx_schedule_eid_date ON schedule(eid, date)"
+
+ATTENDANCE_TABLE = """
+    CREATE TABLE IF NOT EXISTS attendance (
+        eid INTEGER,
+        action TEXT,
+        timestamp DATETIME,
+        epoch INTEGER,
+        FOREIGN KEY (eid) REFERENCES employees(eid) ON DELETE RESTRICT
+    )
+"""
+
+# timestamp as whole seconds since 1970-01-01 (wall clock, no time zone), indexed per employee
+ATTENDANCE_INDEX = "CREATE INDEX IF NOT EXISTS idx_attendance_eid_epoch ON attendance(eid, epoch)"
+
+# rows inserted without an epoch (e.g. copied from attendance.db) get it from their timestamp
+ATTENDANCE_EPOCH_TRIGGER = """
+    CREATE TRIGGER IF NOT EXISTS attendance_epoch AFTER INSERT ON attendance WHEN new.epoch IS NULL BEGIN
+        UPDATE attendance SET epoch = CAST(strftime('%s', new.timestamp) AS INTEGER) WHERE rowid = new.rowid;
+    END
+"""
 
-        # Create managers table if not exists
+# worked seconds per employee per day and per week (weeks start on Sunday), kept up to date on Punch-Out
+HOURS_DAILY_TABLE = """
+    CREATE TABLE IF NOT EXISTS hours_daily (
+        eid INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        seconds INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (eid, day),
+        FOREIGN KEY (eid) REFERENCES employees(eid) ON DELETE RESTRICT
+    ) WITHOUT ROWID
+"""
+
+HOURS_WEEKLY_TABLE = """
+    CREATE TABLE IF NOT EXISTS hours_weekly (
+        eid INTEGER NOT NULL,
+        week_start TEXT NOT NULL,
+        seconds INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (eid, week_start),
+        FOREIGN KEY (eid) REFERENCES employees(eid) ON DELETE RESTRICT
+    ) WITHOUT ROWID
+"""
+
+# tips paid out per employee per service window, amounts in cents
+TIP_LEDGER_TABLE = """
+    CREATE TABLE IF NOT EXISTS tip_ledger (
+        day TEXT NOT NULL,
+        window_start TEXT NOT NULL,
+        window_end TEXT NOT NULL,
+        eid INTEGER NOT NULL,
+        minutes REAL NOT NULL,
+        amount_cents INTEGER NOT NULL,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (day, window_start, window_end, eid)
+    )
+"""
+
+MIGRATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS migrations (
+        name TEXT PRIMARY KEY,
+        applied_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+MIGRATED_TABLES = ("employees", "managers", "availability", "schedule", "attendance")
+
+EMPLOYEE_INDEXES = (
+    # NOCASE so prefix LIKE searches on names can use the index
+    "CREATE INDEX IF NOT EXISTS idx_employees_fname ON employees(fname COLLATE NOCASE)",
+    "CREATE INDEX IF NOT EXISTS idx_employees_lname ON employees(lname COLLATE NOCASE)",
+    "CREATE INDEX IF NOT EXISTS idx_employees_pos ON employees(pos)",
+    "CREATE INDEX IF NOT EXISTS idx_employees_email ON employees(email COLLATE NOCASE)",
+    "CREATE INDEX IF NOT EXISTS idx_employees_date_joined ON employees(date_joined)",
+)
+
+EMPLOYEE_FTS_TRIGGERS = (
+    # keep the full text index in step with the employees table
+    """CREATE TRIGGER IF NOT EXISTS employees_fts_ai AFTER INSERT ON employees BEGIN
+        INSERT INTO employees_fts(rowid, fname, lname, address) VALUES (new.eid, new.fname, new.lname, new.address);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS employees_fts_ad AFTER DELETE ON employees BEGIN
+        INSERT INTO employees_fts(employees_fts, rowid, fname, lname, address) VALUES ('delete', old.eid, old.fname, old.lname, old.address);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS employees_fts_au AFTER UPDATE ON employees BEGIN
+        INSERT INTO employees_fts(employees_fts, rowid, fname, lname, address) VALUES ('delete', old.eid, old.fname, old.lname, old.address);
+        INSERT INTO employees_fts(rowid, fname, lname, address) VALUES (new.eid, new.fname, new.lname, new.address);
+    END""",
+)
+
+
+def create_employee_fts(connection):
+    # optional FTS5 index over names and addresses, skipped when SQLite is built without FTS5
+    cursor = connection.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'employees_fts'")
+    if cursor.fetchone():
+        return
+    try:
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS managers (
-                username TEXT PRIMARY KEY,
-                password TEXT
+            CREATE VIRTUAL TABLE employees_fts USING fts5(
+                fname, lname, address, content='employees', content_rowid='eid'
             )
         """)
+    except sqlite3.OperationalError:
+        return
+    for trigger in EMPLOYEE_FTS_TRIGGERS:
+        cursor.execute(trigger)
+    cursor.execute("INSERT INTO employees_fts(employees_fts) VALUES ('rebuild')") # index existing rows
+
+
+def add_attendance_epoch(connection):
+    # attendance tables created before the epoch column existed get it added and filled in
+    cursor = connection.cursor()
+    cursor.execute("PRAGMA table_info(attendance)")
+    if any(column[1] == "epoch" for column in cursor.fetchall()):
+        return
+    cursor.execute("ALTER TABLE attendance ADD COLUMN epoch INTEGER")
+    cursor.execute("UPDATE attendance SET epoch = CAST(strftime('%s', timestamp) AS INTEGER)")
+
+
+def migrate_legacy_databases(connection, files=LEGACY_DATABASE_FILES):
+    # copy the rows of the old per-table database files into this one, each file only once
+    connection.commit() # ATTACH and PRAGMA foreign_keys can't run inside a transaction
+    cursor = connection.cursor()
+    for legacy_file in files:
+        if not os.path.exists(legacy_file) or os.path.abspath(legacy_file) == os.path.abspath(DATABASE_FILE):
+            continue
+        cursor.execute("SELECT 1 FROM migrations WHERE name = ?", (legacy_file,))
+        if cursor.fetchone():
+            continue
+
+        cursor.execute("PRAGMA foreign_keys = OFF") # old rows may point at employees that no longer exist
+        cursor.execute("ATTACH DATABASE ? AS legacy", (legacy_file,))
+        try:
+            with connection:
+                cursor.execute("SELECT name FROM legacy.sqlite_master WHERE type = 'table'")
+                for (table,) in cursor.fetchall():
+                    if table not in MIGRATED_TABLES:
+                        continue
+                    cursor.execute(f"PRAGMA main.table_info({table})")
+                    main_columns = {column[1] for column in cursor.fetchall()}
+                    cursor.execute(f"PRAGMA legacy.table_info({table})")
+                    columns = ", ".join(column[1] for column in cursor.fetchall() if column[1] in main_columns)
+                    cursor.execute(f"INSERT OR IGNORE INTO main.{table} ({columns}) SELECT {columns} FROM legacy.{table}")
+                    if table == "attendance" and cursor.rowcount > 0: # new punches, work out the hours totals again
+                        cursor.execute("DELETE FROM migrations WHERE name = 'hours_rollup'")
+                cursor.execute("INSERT INTO migrations (name) VALUES (?)", (legacy_file,))
+        finally:
+            cursor.execute("DETACH DATABASE legacy")
+            cursor.execute("PRAGMA foreign_keys = ON")
+
+
+def backfill_hours_rollup(connection):
+    # fill the rollup tables from existing attendance the first time they are used
+    cursor = connection.cursor()
+    cursor.execute("SELECT 1 FROM migrations WHERE name = 'hours_rollup'")
+    if cursor.fetchone():
+        return
+    from Attendance import rebuild_rollup # Attendance imports this module
+    rebuild_rollup(cursor)
+    cursor.execute("INSERT INTO migrations (name) VALUES ('hours_rollup')")
+
+
+def has_employee_fts():
+    row = execute_query("SELECT 1 FROM sqlite_master WHERE name = 'employees_fts'", fetchone=True)
+    return row is not None
+
+
+_local = threading.local()  # per-thread {db file: connection}
+_schemas = {}  # db file -> list of DDL statements
+_checks = {}  # db file -> functions run on every first open, even when the schema is up to date
+_ready = set()  # db files whose schema has already been applied in this process
+_schema_lock = threading.Lock()
+_stats = {"opens": 0, "queries": 0}
+_stats_lock = threading.Lock()
+
+# statements that take longer than this (execute plus fetching the rows) are logged with their query plan
+SLOW_QUERY_SECONDS = float(os.environ.get("EMS_SLOW_QUERY_MS", "100")) / 1000
+LATENCY_SAMPLES = 1024  # latest run times kept per statement for the percentiles
+SLOW_QUERY_LOG_SIZE = 100
+SLOW_QUERY_LOGGER = "ems.slow_query"
+_query_stats = {}  # normalised SQL -> [count, total seconds, max seconds, rows returned, rows changed, samples]
+_slow_queries = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+
+
+def _count(key, n=1):
+    with _stats_lock:
+        _stats[key] += n
+
+
+def _record(sql, parameters, seconds, rows, changes, connection):
+    key = " ".join(sql.split())
+    with _stats_lock:
+        entry = _query_stats.get(key)
+        if entry is None:
+            entry = _query_stats[key] = [0, 0.0, 0.0, 0, 0, deque(maxlen=LATENCY_SAMPLES)]
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+        entry[3] += rows
+        entry[4] += changes
+        entry[5].append(seconds)
+    if seconds >= SLOW_QUERY_SECONDS:
+        _log_slow_query(key, sql, parameters, seconds, rows, connection)
+
+
+def _log_slow_query(key, sql, parameters, seconds, rows, connection):
+    plan = []
+    if not key.upper().startswith(("EXPLAIN", "PRAGMA", "BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE",
+                                   "CREATE", "ATTACH", "DETACH")):
+        try:
+            # a plain cursor, so the EXPLAIN itself isn't counted
+            cursor = sqlite3.Cursor(connection)
+            plan = [row[-1] for row in cursor.execute("EXPLAIN QUERY PLAN " + sql, parameters)]
+            cursor.close()
+        except sqlite3.Error:
+            pass
+    entry = {"sql": key, "ms": round(seconds * 1000, 3), "rows": rows, "plan": plan,
+             "at": time.strftime("%Y-%m-%d %H:%M:%S")}
+    with _stats_lock:
+        _slow_queries.append(entry)
+    import logging # loaded only once something is slow, it would add ~10 ms to every kiosk start
+    logging.getLogger(SLOW_QUERY_LOGGER).warning("slow query (%.1f ms, %d rows): %s\n  plan: %s", entry["ms"], rows, key,
+                           "; ".join(plan) or "-")
+
+
+class _Cursor(sqlite3.Cursor):
+    # cursor that times every statement run through it, from execute until its rows are used up
+    # (or the cursor runs something else or is closed), and counts the rows it returned
+    # only fetchmany and fetchall are timed and counted; rows read by iterating or with fetchone
+    # go straight to sqlite3, so the hot per-row paths pay no extra Python call
+    _sql = None
+
+    def _finish(self):
+        if self._sql is not None:
+            sql, self._sql = self._sql, None
+            _record(sql, self._parameters, self._elapsed, self._rows, 0, self.connection)
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        _count("queries")
+        started = time.perf_counter()
+        result = super().execute(sql, parameters)
+        elapsed = time.perf_counter() - started
+        if self.description is None: # no rows to fetch, done
+            _record(sql, parameters, elapsed, 0, max(self.rowcount, 0), self.connection)
+        else:
+            self._sql, self._parameters, self._elapsed, self._rows = sql, parameters, elapsed, 0
+        return result
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        _count("queries")
+        started = time.perf_counter()
+        result = super().executemany(sql, seq_of_parameters)
+        _record(sql, (), time.perf_counter() - started, 0, max(self.rowcount, 0), self.connection)
+        return result
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        if self._sql is not None:
+            self._elapsed += time.perf_counter() - started
+            self._rows += len(rows)
+            if not rows:
+                self._finish()
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        if self._sql is not None:
+            self._elapsed += time.perf_counter() - started
+            self._rows += len(rows)
+            self._finish()
+        return rows
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except sqlite3.ProgrammingError: # connection already closed
+            pass
+
+
+class _Connection(sqlite3.Connection):
+    # long-lived connection; all statements go through the timing cursor
+    def cursor(self, factory=_Cursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def register_schema(db_file, *statements):
+    # remember the DDL for a database file, it is run once per process on first use
+    # a statement may also be a function that takes the connection
+    with _schema_lock:
+        _schemas.setdefault(db_file, []).extend(statements)
+        _ready.discard(db_file)
+
+
+def register_check(db_file, *checks):
+    # data migrations that must notice new work on their own (e.g. a legacy file copied in later),
+    # each one should cost no more than a lookup when there is nothing to do
+    with _schema_lock:
+        _checks.setdefault(db_file, []).extend(checks)
+        _ready.discard(db_file)
+
+
+def _schema_fingerprint(statements):
+    # changes whenever a statement is added, removed or edited (a function by its name)
+    text = "\n".join(s if isinstance(s, str) else f"{s.__module__}.{s.__qualname__}" for s in statements)
+    return zlib.crc32(text.encode()) & 0x7FFFFFFF
+
+
+def _apply_schema(db_file, connection):
+    # the fingerprint of the applied schema is kept in PRAGMA user_version, so opening a file that is
+    # already up to date costs one PRAGMA instead of running every statement again
+    with _schema_lock:
+        if db_file in _ready:
+            return
+        statements = _schemas.get(db_file, [])
+        fingerprint = _schema_fingerprint(statements)
+        if connection.execute("PRAGMA user_version").fetchone()[0] != fingerprint:
+            with connection:
+                for statement in statements:
+                    if callable(statement):
+                        statement(connection)
+                    else:
+                        connection.execute(statement)
+                connection.execute(f"PRAGMA user_version = {fingerprint}")
+        with connection:
+            for check in _checks.get(db_file, []):
+                check(connection)
+        _ready.add(db_file)
+
+
+def get_connection(db_file=DATABASE_FILE):
+    # return this thread's open connection to db_file, opening it on first use
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    connection = connections.get(db_file)
+    if connection is None:
+        connection = sqlite3.connect(db_file, factory=_Connection, timeout=BUSY_TIMEOUT,
+                                     cached_statements=STATEMENT_CACHE_SIZE)
+        connection.execute("PRAGMA foreign_keys = ON")
+        # WAL lets readers run while a write is in progress, and with it a commit only needs
+        # synchronous=NORMAL to stay consistent after a crash
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        connections[db_file] = connection
+        _count("opens")
+
+    if db_file not in _ready:
+        _apply_schema(db_file, connection)
+    return connection
+
+
+def close_connections():
+    # close every connection opened by the current thread
+    connections = getattr(_local, "connections", {})
+    for connection in connections.values():
+        connection.close()
+    connections.clear()
+
+
+def connection_stats():
+    # number of connections opened and statements run since the process started
+    with _stats_lock:
+        return dict(_stats)
+
+
+def query_stats(limit=None):
+    # one dict per distinct statement, the most total time first
+    with _stats_lock:
+        entries = [(sql, count, total, longest, rows, changes, sorted(samples))
+                   for sql, (count, total, longest, rows, changes, samples) in _query_stats.items()]
+    stats = []
+    for sql, count, total, longest, rows, changes, samples in sorted(entries, key=lambda e: -e[2]):
+        stats.append({"sql": sql, "count": count, "total_ms": round(total * 1000, 3),
+                      "mean_ms": round(total / count * 1000, 3),
+                      "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000, 3),
+                      "max_ms": round(longest * 1000, 3), "rows": rows, "changes": changes})
+    return stats[:limit] if limit else stats
+
+
+def slow_queries():
+    with _stats_lock:
+        return list(_slow_queries)
+
+
+def reset_query_stats():
+    with _stats_lock:
+        _query_stats.clear()
+        _slow_queries.clear()
+
+
+def dump_query_stats(out=None, limit=20):
+    # plain text report of the hottest statements and the latest slow ones
+    out = out or sys.stdout
+    stats = connection_stats()
+    out.write(f"{stats['opens']} connections opened, {stats['queries']} statements run\n")
+    out.write(f"{'count':>8} {'total ms':>11} {'mean ms':>9} {'p99 ms':>9} {'max ms':>9} {'rows':>9}  statement\n")
+    for entry in query_stats(limit):
+        out.write(f"{entry['count']:>8} {entry['total_ms']:>11.1f} {entry['mean_ms']:>9.3f} {entry['p99_ms']:>9.3f} "
+                  f"{entry['max_ms']:>9.3f} {entry['rows']:>9}  {entry['sql'][:120]}\n")
+    slow = slow_queries()
+    if slow:
+        out.write(f"\nslow queries (over {SLOW_QUERY_SECONDS * 1000:.0f} ms), latest last:\n")
+        for entry in slow[-limit:]:
+            out.write(f"{entry['at']} {entry['ms']:>9.1f} ms {entry['rows']:>7} rows  {entry['sql'][:120]}\n")
+            for step in entry["plan"]:
+                out.write(f"    {step}\n")
+
+
+register_schema(DATABASE_FILE, EMPLOYEES_TABLE, MANAGERS_TABLE, AVAILABILITY_TABLE, SCHEDULE_TABLE,
+                ATTENDANCE_TABLE, HOURS_DAILY_TABLE, HOURS_WEEKLY_TABLE, TIP_LEDGER_TABLE,
+                MIGRATIONS_TABLE, *EMPLOYEE_INDEXES, SCHEDULE_INDEX, create_employee_fts,
+                add_attendance_epoch, ATTENDANCE_INDEX, ATTENDANCE_EPOCH_TRIGGER)
+register_check(DATABASE_FILE, migrate_legacy_databases, backfill_hours_rollup)
+
+
+def create_tables():
+    # make sure every table exists
+    get_connection(DATABASE_FILE)
 
 def execute_query(query, values=None, fetchone=False, fetchall=False, commit=True):
-    # make the connection with database file
-    with sqlite3.connect(DATABASE_FILE) as connection:
+    # reuse the thread's connection, the with block commits or rolls back
+    connection = get_connection()
+    with connection:
         cursor = connection.cursor()
 
-        # Create tables if they don't exist
-        create_tables()
-
         if values:
             cursor.execute(query, values)
         else:
@@ -51,6 +512,12 @@ def execute_query(query, values=None, fetchone=False, fetchall=False, commit=Tru
         elif commit:
             connection.commit()
 
+def execute_many(query, rows):
+    # run one statement for every row inside a single transaction
+    connection = get_connection()
+    with connection:
+        return connection.executemany(query, rows).rowcount
+
 # check the username and password , if it exists then give access
 # otherwise ask for setting up username and password then after give the access
 def vmc(username, password):
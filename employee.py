@@ -1,12 +1,23 @@
 #employee.py
 # used database for store and load the data
 # for reference: https://docs.python.org/3/library/sqlite3.html
-import re
-from database import execute_query
-from datetime import datetime,date
+import sqlite3
+from itertools import chain, islice
+from database import execute_query, execute_many, get_connection, has_employee_fts
+from cache import LRUCache
+from datetime import date
+
+
+EMAIL_PATTERN = r"[^@]+@[^@]+\.[^@]+"
+SALARY_PATTERN = r"^\d+\.\d{2}$"
 
 
 class Employee:
+    # columns written back to the database, a change to any of them marks the employee dirty
+    # (same order as the employees table)
+    _FIELDS = ("eid", "fname", "lname", "pos", "email", "address", "phone", "_date_joined", "salary")
+    __slots__ = _FIELDS + ("_dirty",)  # no per-instance __dict__
+
     def __init__(self, eid, fname, lname, pos, email, address, phone, date_joined=None, salary='0.00'):
         if not self.validate_email(email):
             raise ValueError("Invalid email format.")
@@ -20,6 +31,28 @@ class Employee:
         self._date_joined = date.today() if date_joined is None else date_joined # by default value is current date
         self.salary = round(float(salary), 2)  # This ensures the salary is a float rounded to 2 decimal places
 
+    @classmethod
+    def from_row(cls, row):
+        # trusted path for rows read from the employees table: they were validated when written,
+        # so skip the email check and salary rounding, and parse date_joined only when asked for
+        emp = cls.__new__(cls)
+        for set_slot, value in zip(_ROW_SETTERS, row):
+            set_slot(emp, value)
+        _set_dirty(emp, False)
+        return emp
+
+    def __setattr__(self, name, value):
+        if name in Employee._FIELDS and getattr(self, name, None) != value:
+            object.__setattr__(self, "_dirty", True)
+        object.__setattr__(self, name, value)
+
+    @property
+    def dirty(self):
+        return getattr(self, "_dirty", True) # never saved or changed since the last save
+
+    def mark_clean(self):
+        object.__setattr__(self, "_dirty", False)
+
     def __repr__(self):
         return f"\nEmployee Id: {self.eid}\nFull name: {self.fname} {self.lname}\nPosition: {self.pos}\nE-mail: {self.email}\nAddress: {self.address}\nPhone: {self.phone}\nDate of joined: {self._date_joined}\nSalary: {self.salary}"
 
@@ -28,8 +61,8 @@ class Employee:
 
     @staticmethod
     def validate_email(email):
-        email_regex = r"[^@]+@[^@]+\.[^@]+"
-        return re.match(email_regex, email) # check the email format
+        import re # only needed to check typed-in details, a punch never loads it
+        return re.match(EMAIL_PATTERN, email) # check the email format
 
     @staticmethod
     def validate_postal_code(pos_code):
@@ -37,6 +70,9 @@ class Employee:
 
     @property
     def date_joined(self):
+        if isinstance(self._date_joined, str): # still the text stored in the database
+            parsed = date.fromisoformat(self._date_joined) if self._date_joined else None # YYYY-MM-DD, parsed in C
+            object.__setattr__(self, "_date_joined", parsed)
         return self._date_joined
 
     @date_joined.setter
@@ -50,8 +86,8 @@ class Employee:
 
     @staticmethod
     def validate_salary(salary):
-        salary_regex = r"^\d+\.\d{2}$"
-        return re.match(salary_regex, str(salary))
+        import re
+        return re.match(SALARY_PATTERN, str(salary))
 
     def to_dict(self):
         return {
@@ -62,82 +98,205 @@ class Employee:
             "email": self.email,
             "address": self.address,
             "phone": self.phone,
-            "date_joined": self._date_joined,
+            "date_joined": self.date_joined,
             "salary": "{:.2f}".format(float(self.salary))
         }
 
     @classmethod
     def from_dict(cls, data):
         e = cls(data["eid"], data["fname"], data["lname"], data["pos"], data["email"],
-                data["address"], data["phone"], data["salary"])
+                data["address"], data["phone"], salary=data["salary"])
 
         # Assign date_joined directly from the dictionary
         e._date_joined = data["date_joined"]
 
         return e
 
-# load the data from database
-def load_employees_from_database():
+# slot setters used by Employee.from_row, they skip __setattr__ and the dirty check
+_ROW_SETTERS = [Employee.__dict__[name].__set__ for name in Employee._FIELDS]
+_set_dirty = Employee.__dict__["_dirty"].__set__
+
+EMPLOYEE_CACHE_SIZE = 4096
+# eid -> Employee, filled by get_employee and cleared by every write path
+# cached employees are shared, treat them as read-only
+employee_cache = LRUCache(maxsize=EMPLOYEE_CACHE_SIZE)
+
+UPSERT_QUERY = """
+    INSERT INTO employees (eid, fname, lname, pos, email, address, phone, date_joined, salary)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(eid) DO UPDATE SET
+        fname=excluded.fname, lname=excluded.lname, pos=excluded.pos, email=excluded.email,
+        address=excluded.address, phone=excluded.phone, date_joined=excluded.date_joined,
+        salary=excluded.salary
+"""
+
+EMPLOYEE_COLUMNS = ("eid", "fname", "lname", "pos", "email", "address", "phone", "date_joined", "salary")
+
+def _order_clause(order_by):
+    # only allow "column [ASC|DESC], ..." so the ORDER BY can't carry arbitrary SQL
+    parts = []
+    for part in order_by.split(","):
+        words = part.split()
+        if (not words or len(words) > 2 or words[0] not in EMPLOYEE_COLUMNS
+                or (len(words) == 2 and words[1].upper() not in ("ASC", "DESC"))):
+            raise ValueError(f"Cannot order employees by {order_by!r}")
+        parts.append(" ".join(words))
+    return ", ".join(parts)
+
+# yield employees one at a time, reading batch_size rows from the database at once
+# where is an SQL condition using ? placeholders filled from params
+def iter_employees(batch_size=500, where=None, params=(), order_by="eid"):
     query = "SELECT * FROM employees"
-    data = execute_query(query, fetchall=True)
-    emp = []
-
-    for e in data:
-        # Convert the salary to float if it's stored as a string
-        e = list(e)
-        e[-1] = float(e[-1])
-        e[-2] = datetime.strptime(e[-2], '%Y-%m-%d').date() if e[-2] else None # for reference: https://www.programiz.com/python-programming/datetime/strptime
+    if where:
+        query += f" WHERE {where}"
+    if order_by:
+        query += f" ORDER BY {_order_clause(order_by)}"
 
-        emp.append(Employee(*e))
+    cursor = get_connection().cursor()
+    try:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield Employee.from_row(row)
+    finally:
+        cursor.close()
 
+# load the data from database
+def load_employees_from_database():
+    return list(iter_employees())
+
+def _like_prefix(prefix):
+    # LIKE pattern matching values that start with prefix, with % and _ taken literally
+    return prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+# search employees using the indexes on the employees table, all given filters must match
+# fname/lname match by prefix, pos exactly, email ignoring case, joined_from/joined_to are inclusive dates
+# text searches names and addresses (full text index when SQLite has FTS5)
+def search_employees(fname=None, lname=None, pos=None, email=None, joined_from=None, joined_to=None,
+                     text=None, batch_size=500, order_by="eid"):
+    conditions = []
+    params = []
+    if fname:
+        conditions.append("fname LIKE ? ESCAPE '\\'")
+        params.append(_like_prefix(fname))
+    if lname:
+        conditions.append("lname LIKE ? ESCAPE '\\'")
+        params.append(_like_prefix(lname))
+    if pos:
+        conditions.append("pos = ?")
+        params.append(pos)
+    if email:
+        conditions.append("email = ? COLLATE NOCASE")
+        params.append(email)
+    if joined_from:
+        conditions.append("date_joined >= ?")
+        params.append(str(joined_from))
+    if joined_to:
+        conditions.append("date_joined <= ?")
+        params.append(str(joined_to))
+    if text and text.split():
+        if has_employee_fts():
+            # every word is a quoted prefix term, so user input can't break the MATCH syntax
+            match = " ".join('"{}"*'.format(word.replace('"', '""')) for word in text.split())
+            conditions.append("eid IN (SELECT rowid FROM employees_fts WHERE employees_fts MATCH ?)")
+            params.append(match)
+        else:
+            for word in text.split():
+                conditions.append("(fname || ' ' || lname || ' ' || address) LIKE ? ESCAPE '\\'")
+                params.append("%" + _like_prefix(word))
+
+    where = " AND ".join(conditions) if conditions else None
+    return iter_employees(batch_size=batch_size, where=where, params=tuple(params), order_by=order_by)
+
+# which of the given employee IDs exist, one query per 900 IDs instead of one per ID
+def existing_eids(eids):
+    eids = list(set(eids))
+    known = set()
+    cursor = get_connection().cursor()
+    for i in range(0, len(eids), 900): # stay under SQLite's host parameter limit
+        part = eids[i:i + 900]
+        cursor.execute("SELECT eid FROM employees WHERE eid IN ({})".format(",".join("?" * len(part))), part)
+        known.update(eid for (eid,) in cursor.fetchall())
+    return known
+
+# columns that patch_employee is allowed to change
+EDITABLE_FIELDS = ("fname", "lname", "pos", "email", "address", "phone", "salary", "date_joined")
+
+def _clean_field(name, value):
+    # validate one new column value the same way the Employee constructor does
+    if name == "email" and not Employee.validate_email(value):
+        raise ValueError("Invalid email format.")
+    if name == "salary":
+        try:
+            return round(float(value), 2)
+        except (TypeError, ValueError):
+            raise ValueError("Invalid salary format. Please enter a positive number with two decimal places.")
+    if name == "date_joined":
+        if isinstance(value, str):
+            try:
+                value = date.fromisoformat(value)
+            except ValueError:
+                raise ValueError("Invalid date format.")
+        if value > date.today():
+            raise ValueError("Date of joining cannot be in the future.")
+        return str(value)
+    return value
+
+# get one employee by id, None if there is no such employee
+def get_employee(eid):
+    emp = employee_cache.get(eid)
+    if emp is None:
+        generation = employee_cache.generation() # a patch or delete committed after this drops the put
+        row = execute_query("SELECT * FROM employees WHERE eid = ?", (eid,), fetchone=True)
+        if row is None:
+            return None
+        emp = Employee.from_row(row)
+        employee_cache.put(eid, emp, generation)
     return emp
 
-# save the data into the database
+# change some columns of one employee and return the updated employee, None if not found
+def patch_employee(eid, **fields):
+    unknown = [name for name in fields if name not in EDITABLE_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown employee field(s): {', '.join(unknown)}")
+    if not fields:
+        return get_employee(eid)
+
+    values = [_clean_field(name, value) for name, value in fields.items()]
+    sets = ", ".join(f"{name}=?" for name in fields)
+    rows = execute_query(f"UPDATE employees SET {sets} WHERE eid = ? RETURNING *", (*values, eid), fetchall=True)
+    employee_cache.invalidate(eid)
+    return Employee.from_row(rows[0]) if rows else None
+
+# delete one employee and return what was deleted, None if not found
+# an employee with attendance, hours, availability or schedule rows is kept, deleting would lose that history
+def remove_employee(eid):
+    try:
+        rows = execute_query("DELETE FROM employees WHERE eid = ? RETURNING *", (eid,), fetchall=True)
+    except sqlite3.IntegrityError as e: # ON DELETE RESTRICT
+        raise sqlite3.IntegrityError(f"Employee with ID {eid} has attendance or schedule records and can't be "
+                                     f"deleted.") from e
+    employee_cache.invalidate(eid)
+    return Employee.from_row(rows[0]) if rows else None
+
+# save the new and changed employees into the database in one transaction
+# for reference: https://www.sqlite.org/lang_upsert.html
 def save_employees_to_database(employees):
-    # Check if the employees table exists
-    t = "SELECT name FROM sqlite_master WHERE type='table' AND name='employees'"
-    te = execute_query(t, fetchone=True)
-
-    if not te:
-        # If the table doesn't exist, create it
-        execute_query("""
-            CREATE TABLE employees (
-                eid INTEGER PRIMARY KEY,
-                fname TEXT,
-                lname TEXT,
-                pos TEXT,
-                email TEXT,
-                address TEXT,
-                phone TEXT,
-                date_joined DATE,
-                salary REAL
-            )
-        """)
-
-    for emp in employees:
-        query = "SELECT * FROM employees WHERE eid = ?"
-        existing_employee = execute_query(query, (employee.eid,), fetchone=True)
-
-        if existing_employee:
-            # If the employee exists, perform an update
-            uq = """
-                UPDATE employees
-                SET fname=?, lname=?, pos=?, email=?, address=?, phone=?, date_joined=?, salary=?
-                WHERE eid=?
-            """
-            execute_query(uq, (emp.fname, emp.lname, emp.pos, emp.email,
-                                         emp.address, emp.phone, emp.date_joined, emp.salary,
-                                         emp.eid))
-
-        # for reference: https://www.tutorialspoint.com/sqlite/sqlite_insert_query.htm
-        else:
-            # If the employee doesn't exist, perform an insert
-            iq = """
-                INSERT INTO employees (eid, fname, lname, pos, email, address, phone, date_joined, salary)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """
-            execute_query(iq, (emp.eid, emp.fname, emp.lname, emp.pos, emp.email,
-                                         emp.address, emp.phone, emp.date_joined, emp.salary))
+    changed = [emp for emp in employees if emp.dirty]
+    if not changed:
+        return 0
+
+    rows = [(emp.eid, emp.fname, emp.lname, emp.pos, emp.email, emp.address, emp.phone,
+             emp.date_joined.isoformat() if emp.date_joined else None, emp.salary) for emp in changed]
+    execute_many(UPSERT_QUERY, rows)
+
+    for emp in changed:
+        emp.mark_clean()
+        employee_cache.invalidate(emp.eid)
+    return len(changed)
 
 employees = []
 
@@ -146,7 +305,7 @@ def get_employee_details_from_user(manager_mode=False):
     try:
         eid = int(input("Enter employee ID: "))
         # If the entered ID already exists, notify the user and return
-        if any(emp.eid == eid for emp in employees):
+        if get_employee(eid) is not None:
             print(f"An employee with ID {eid} already exists!")
             return None
         fname = input("Enter first name: ")
@@ -181,27 +340,60 @@ def get_employee_details_from_user(manager_mode=False):
 
 #add the employee
 def create_employee():
-    global employee
     emp = get_employee_details_from_user() # get the details from the user
     if emp:
-        employees.append(employee)
-        print(f"Employee {employee.get_full_name()} added successfully!")
+        employees.append(emp)
+        print(f"Employee {emp.get_full_name()} added successfully!")
     save_employees_to_database(employees) #save the data into database
 
 def read_employee(eid):
-    global employees
-    employees = load_employees_from_database()  # Load employees data from the database
-    for emp in employees:
-        if emp.eid == eid:
-            return emp
-    return None
+    return get_employee(eid)
+
+PAGE_SIZE = 20 # employees printed per page by "View all"
+
+def print_paged(rows):
+    # print employees a page at a time, rows can be any iterator of employees
+    rows = iter(rows)
+    while True:
+        page = list(islice(rows, PAGE_SIZE))
+        for emp in page:
+            print(emp)
+        if len(page) < PAGE_SIZE:
+            break
+        if input("Press Enter for more or 'q' to stop: ").lower() == 'q':
+            break
+
+#search the employees, blank answers are skipped
+def search_employee_menu():
+    filters = {
+        "fname": input("First name starts with: ").strip(),
+        "lname": input("Last name starts with: ").strip(),
+        "pos": input("Position: ").strip(),
+        "email": input("Email: ").strip(),
+        "joined_from": input("Joined on or after (YYYY-MM-DD): ").strip(),
+        "joined_to": input("Joined on or before (YYYY-MM-DD): ").strip(),
+        "text": input("Name or address contains: ").strip(),
+    }
+    for key in ("joined_from", "joined_to"):
+        if filters[key]:
+            try:
+                date.fromisoformat(filters[key])
+            except ValueError:
+                print("Invalid date format.")
+                return
+
+    rows = search_employees(**{key: value for key, value in filters.items() if value})
+    first = next(rows, None)
+    if first is None:
+        print("No matching employees found.")
+        return
+    print_paged(chain([first], rows))
 
 #view the details of employee
 def view_employee():
-    global employees
-    employees = load_employees_from_database()  # Load employees directly from the database
     print("1. View by ID")
     print("2. View all")
+    print("3. Search")
     choice = input("Choose an option: ")
     if choice == '1':
         eid = int(input("Enter Employee ID: "))
@@ -211,101 +403,68 @@ def view_employee():
         else:
             print(f"Employee with ID {eid} not found!")
     elif choice == '2':
-        for emp in employees:
-            print(emp) #display all employees details
+        print_paged(iter_employees(batch_size=PAGE_SIZE)) #display all employees details, one page at a time
+    elif choice == '3':
+        search_employee_menu()
 
 #update the employee details
 def update_employee(eid, manager_mode=False):
-    employees = load_employees_from_database()  # Load fresh data
-    emp = read_employee(eid)
+    emp = get_employee(eid)
     if not emp:
         print(f"Employee with ID {eid} not found!")
         return
 
     print(f"Updating details for {emp.get_full_name()}.")
     fields = ['1. First Name', '2. Last Name', '3. Position', '4. Email', '5. Address', '6. Phone']
+    prompts = {
+        '1': ('fname', "Enter new first name: "),
+        '2': ('lname', "Enter new last name: "),
+        '3': ('pos', "Enter new position: "),
+        '4': ('email', "Enter new email: "),
+        '5': ('address', "Enter new full address: "),
+        '6': ('phone', "Enter new phone: "),
+    }
 
     # Extend the fields list when manager_mode is True
     if manager_mode:
         fields.extend(['7. Salary', '8. Date of Joining'])
+        prompts['7'] = ('salary', "Enter new salary: ")
+        prompts['8'] = ('date_joined', "Enter new date of joining (format: YYYY-MM-DD): ")
 
     for field in fields:
         print(field)
 
     ch = input("Enter your choice: ")
-
-    if ch == '1':
-        nv = input("Enter new first name: ")
-        emp.fname = nv
-    elif ch == '2':
-        nv = input("Enter new last name: ")
-        emp.lname = nv
-    elif ch == '3':
-        nv = input("Enter new position: ")
-        emp.pos = nv
-    elif ch == '4':
-        nv = input("Enter new email: ")
-        emp.email = nv
-    elif ch == '5':
-        nv = input("Enter new full address: ")
-        emp.address = nv
-    elif ch == '6':
-        nv = input("Enter new phone: ")
-        emp.phone = nv
-    elif ch == '7' and manager_mode:
-        nv = input("Enter new salary: ")
-        try:
-            emp.salary = round(float(nv), 2)
-        except ValueError:
-            print("Invalid salary format. Please enter a positive number with two decimal places.")
-            return
-    elif ch == '8' and manager_mode:
-        nv = input("Enter new date of joining (format: YYYY-MM-DD): ")
-        try:
-            emp.date_joined = date.fromisoformat(nv)
-        except ValueError:
-            print("Invalid date format. No changes made.")
-            return
-    else:
+    if ch not in prompts:
         print("Invalid choice! No changes made.")
         return
 
-    # Update the list of employees with the modified employee
-    ue = [e if e.eid != eid else emp for e in employees]
+    field, prompt = prompts[ch]
+    nv = input(prompt)
+    try:
+        emp = patch_employee(eid, **{field: nv}) # writes only this row
+    except ValueError as e:
+        print(f"{e} No changes made.")
+        return
 
-    # Save the updated list to the database
-    save_employees_to_database(ue)
     print(f"Updated details for {emp.get_full_name()}.")
 
 # delete the employee details
 def delete_employee(eid):
-    global employees
-    # Load fresh data
-    employees = load_employees_from_database()
-
-    # Check if the employee with the given ID exists
-    ed = next((e for e in employees if e.eid == eid), None)
+    try:
+        emp = remove_employee(eid)
+    except sqlite3.IntegrityError as e:
+        print(e)
+        return
 
-    if not ed:
+    if not emp:
         print(f"Employee with ID {eid} not found!")
         return
 
-    # Update the list by excluding the employee to delete
-    emp = [e for e in employees if e.eid != eid]
-
-    # Save the updated list to the database
-    save_employees_to_database(emp)
-
-    # Execute delete query to remove the employee from the database
-    dq = "DELETE FROM employees WHERE eid = ?"
-    execute_query(dq, (eid,), commit=True)
-
     print(f"Employee with ID {eid} deleted!")
 
 #employee menu
 def employee_menu():
-    global employees
-    employees = load_employees_from_database()
     while True:
         print("\nEmployee Management System:")
         print("1. View Employee")
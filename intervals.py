@@ -0,0 +1,61 @@
+#intervals.py
+# static interval index: which intervals overlap a time window
+# intervals are kept sorted by start in an implicit balanced tree where every node also knows the
+# latest end in its subtree, so a query skips every subtree that ends before the window starts
+
+
+class IntervalIndex:
+    def __init__(self, intervals):
+        # intervals: iterable of (start, end, value) with start < end, e.g. epochs and an employee ID
+        items = sorted(item for item in intervals if item[1] > item[0])
+        self._starts = [item[0] for item in items]
+        self._ends = [item[1] for item in items]
+        self._values = [item[2] for item in items]
+        self._max_end = [0] * len(items)
+        self._build()
+
+    def __len__(self):
+        return len(self._starts)
+
+    def _build(self):
+        # fill _max_end bottom-up over the implicit tree (node of [lo, hi) is (lo + hi) // 2)
+        order = []
+        stack = [(0, len(self._starts))]
+        while stack:
+            lo, hi = stack.pop()
+            if lo < hi:
+                mid = (lo + hi) // 2
+                order.append((lo, hi, mid))
+                stack.append((lo, mid))
+                stack.append((mid + 1, hi))
+        for lo, hi, mid in reversed(order): # children are handled before their parent
+            latest = self._ends[mid]
+            if lo < mid:
+                latest = max(latest, self._max_end[(lo + mid) // 2])
+            if mid + 1 < hi:
+                latest = max(latest, self._max_end[(mid + 1 + hi) // 2])
+            self._max_end[mid] = latest
+
+    def overlapping(self, start, end):
+        # values of the intervals that overlap [start, end); an empty window means the instant start
+        if end <= start:
+            end = start + 1
+        found = []
+        stack = [(0, len(self._starts))] if self._starts and self._starts[0] < end else []
+        while stack:
+            lo, hi = stack.pop()
+            mid = (lo + hi) // 2
+            if self._max_end[mid] <= start:
+                continue # nothing below this node is still running at start
+            if lo < mid:
+                stack.append((lo, mid))
+            if self._starts[mid] < end: # otherwise this node and everything right of it start too late
+                if self._ends[mid] > start:
+                    found.append(self._values[mid])
+                if mid + 1 < hi:
+                    stack.append((mid + 1, hi))
+        return found
+
+    def overlapping_many(self, windows):
+        # answer a batch of (start, end) windows against the same index
+        return [self.overlapping(start, end) for start, end in windows]
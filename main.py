@@ -7,12 +7,26 @@
 
 #this is main file
 #main.py
-
-from manager import vmc, add_employee
-from employee import employee_menu, update_employee, delete_employee, view_employee
-from schedule import emp_schedule_menu, Manager_schedule_menu
-from Attendance import attendance_menu
-from Attendance import tips_distribution
+# each menu's modules are imported when the menu is first opened, so a kiosk that only punches
+# loads database and Attendance (with the employee, cache and intervals modules it imports), no menus
+# usage: python main.py                     the menus
+#        python main.py punch-in 7          punch 7 in (punch-out likewise), one process per punch
+#        python main.py --startup-report    cold start time and slowest imports of every menu path
+import sys
+import time
+
+STARTED = time.perf_counter()
+
+from database import create_tables, vmc
+
+STARTUP_BUDGET_MS = 50  # a punch, from the first line of this file to the schema check, interpreter start excluded
+# modules behind each path's menu options, timed by --startup-report
+STARTUP_PATHS = {
+    "punch": ("Attendance",),
+    "employee": ("employee", "schedule", "Attendance", "tips"),
+    "manager": ("manager", "employee", "schedule", "reports"),
+}
+PUNCH_COMMANDS = {"punch-in": "Punch-In", "punch-out": "Punch-Out"}
 
 #manager menu
 def manager_interface():
@@ -24,23 +38,33 @@ def manager_interface():
         print("3. Update employee details")
         print("4. Delete an employee")
         print("5. Employee Scheduling")
-        print("6. Exit")
+        print("6. Attendance Reports")
+        print("7. Exit")
 
         ch = input("Enter your choice: ")
 
+        # only the chosen menu's module is loaded
         if ch == '1':
+            from employee import view_employee
             view_employee() #display all employee details
         elif ch == '2':
+            from manager import add_employee
             add_employee() #add employee
         elif ch == '3':
+            from employee import update_employee
             emp_id = int(input("Enter Employee ID to update: "))
             update_employee(emp_id, manager_mode=True) #update employee details
         elif ch == '4':
+            from employee import delete_employee
             emp_id = int(input("Enter Employee ID to delete: "))
             delete_employee(emp_id) #delete employee details
         elif ch == '5':
+            from schedule import Manager_schedule_menu
             Manager_schedule_menu() #scheduling
         elif ch == '6':
+            from reports import manager_attendance_menu
+            manager_attendance_menu() #hours totals and reports
+        elif ch == '7':
             break
         else:
             print("Invalid ch. Please try again.")
@@ -58,13 +82,18 @@ def employee_interface():
 
         ch = input("Enter your choice: ")
 
+        # only the chosen menu's module is loaded
         if ch == '1':
+            from employee import employee_menu
             employee_menu() #employee profile
         elif ch == '2':
+            from schedule import emp_schedule_menu
             emp_schedule_menu() #shift scheduling
         elif ch == '3':
+            from Attendance import attendance_menu
             attendance_menu() #attendance
         elif ch == '4':
+            from tips import tips_distribution
             tips_distribution() #tip distribution
         elif ch == '5':
             break
@@ -72,6 +101,7 @@ def employee_interface():
             print("Invalid ch! Try again.")
 
 def main():
+    create_tables() # the one schema check, before the first menu
     while True:
         print("Welcome to the Employee Management System.")
 
@@ -102,5 +132,76 @@ def main():
             print("Invalid ch. Please select from the provided options.")
             input("Press Enter to continue...")  # Pause for the user to read the message
 
+def punch(action, eids):
+    # the kiosk path: no menus, no employee list, just the punch and its foreign key check
+    import sqlite3
+    from Attendance import log_attendance
+    create_tables()
+    errors = 0
+    for eid in eids:
+        try:
+            print(f"Employee {eid}: {action} at {log_attendance({'eid': int(eid)}, action)}")
+        except ValueError:
+            print(f"Invalid employee ID {eid!r}.")
+            errors += 1
+        except sqlite3.IntegrityError: # no such employee
+            print(f"Employee with ID {eid} not found!")
+            errors += 1
+    return 1 if errors else 0
+
+def load_path(path):
+    # import what a menu path needs and check the schema, returns the ms since this file started
+    for name in STARTUP_PATHS[path]:
+        __import__(name)
+    create_tables()
+    return (time.perf_counter() - STARTED) * 1000
+
+def _imports(stderr):
+    # {module: cumulative us} of the top-level imports in python -X importtime output
+    imports = {}
+    for line in stderr.splitlines():
+        if line.startswith("import time:") and not line.endswith("imported package"):
+            _, cumulative, name = line.split("|")
+            if not name[1:].startswith(" "):
+                imports[name.strip()] = int(cumulative)
+    return imports
+
+def startup_report(repeat=5, top=6):
+    # every path in fresh interpreters, best of repeat runs, then one -X importtime run for its slowest imports
+    # returns 1 when the punch path is over STARTUP_BUDGET_MS, so it can guard a build
+    import subprocess
+
+    def run(*args):
+        started = time.perf_counter()
+        done = subprocess.run([sys.executable, *args], capture_output=True, text=True, check=True)
+        return (time.perf_counter() - started) * 1000, done.stdout, done.stderr
+
+    interpreter = min(run("-c", "pass")[0] for _ in range(repeat))
+    preloaded = _imports(run("-X", "importtime", "-c", "pass")[2])
+    print(f"Interpreter start: {interpreter:.1f} ms (not counted against the budget)")
+    status = 0
+    for path in STARTUP_PATHS:
+        runs = [run(__file__, "--startup-only", path) for _ in range(repeat)]
+        wall = min(wall for wall, _, _ in runs)
+        startup = min(float(stdout) for _, stdout, _ in runs)
+        note = ""
+        if path == "punch":
+            note = f"  budget {STARTUP_BUDGET_MS} ms" + ("  OVER BUDGET" if startup > STARTUP_BUDGET_MS else "")
+            status = 1 if startup > STARTUP_BUDGET_MS else 0
+        print(f"\n{path}: {startup:.1f} ms after the interpreter, {wall:.1f} ms in all{note}")
+        imports = _imports(run("-X", "importtime", __file__, "--startup-only", path)[2])
+        slowest = sorted(((us, name) for name, us in imports.items() if name not in preloaded), reverse=True)
+        for us, name in slowest[:top]:
+            print(f"    {us / 1000:8.1f} ms  {name}")
+    return status
+
 if __name__ == "__main__":
-    main()
+    args = sys.argv[1:]
+    if args and args[0] in PUNCH_COMMANDS:
+        sys.exit(punch(PUNCH_COMMANDS[args[0]], args[1:]))
+    elif args[:1] == ["--startup-only"]:
+        print(f"{load_path(args[1]):.3f}")
+    elif args[:1] == ["--startup-report"]:
+        sys.exit(startup_report())
+    else:
+        main()
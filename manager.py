@@ -1,5 +1,5 @@
 # manager.py
-from employee import get_employee_details_from_user
+from employee import get_employee_details_from_user, employee_cache
 from database import execute_query, vmc, smc
 
 # Check the username and password
@@ -27,6 +27,7 @@ def add_employee():
     if emp:
         query = "INSERT INTO employees VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
         execute_query(query, (emp.eid, emp.fname, emp.lname, emp.pos, emp.email, emp.address, emp.phone, str(emp._date_joined), emp.salary))
+        employee_cache.invalidate(emp.eid)
 
         print("Employee added successfully!")
 
@@ -0,0 +1,138 @@
+#punches.py
+# punch-in/out service for many kiosks at once
+# any thread (or asyncio task, through asyncio.wrap_future) submits punches to a queue, and a single
+# writer thread takes whatever has queued up every few milliseconds and writes it in one transaction,
+# so a shift change costs a handful of commits instead of one locked write per punch
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from database import DATABASE_FILE, get_connection, close_connections
+from Attendance import PUNCH_ACTIONS, record_punch
+
+FLUSH_INTERVAL = 0.005  # seconds the writer waits for more punches before committing
+MAX_BATCH = 1000  # most punches written in one transaction
+EMPTY_STATS = {"punches": 0, "batches": 0, "errors": 0}
+
+
+class PunchService:
+    def __init__(self, db_file=DATABASE_FILE, flush_interval=FLUSH_INTERVAL, max_batch=MAX_BATCH):
+        self.db_file = db_file
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.stats = dict(EMPTY_STATS)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="punch-writer", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        # write everything already queued, then stop the writer
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def submit(self, eid, action):
+        # queue a punch stamped with the current time, returns a Future for its timestamp text
+        if action not in PUNCH_ACTIONS:
+            raise ValueError(f"Unknown action {action!r}, use 'Punch-In' or 'Punch-Out'.")
+        if self._thread is None:
+            self.start()
+        future = Future()
+        self._queue.put((int(eid), action, datetime.now().replace(microsecond=0), future))
+        return future
+
+    def punch(self, eid, action, timeout=None):
+        # submit and wait until the punch is committed, returns its timestamp
+        return self.submit(eid, action).result(timeout)
+
+    def _next_batch(self):
+        # block for the first punch, then collect what arrives within flush_interval
+        item = self._queue.get()
+        if item is None:
+            return None, True
+        batch = [item]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _write(self, connection, batch):
+        # one transaction for the batch; a savepoint per punch so a bad one (e.g. an unknown
+        # employee) fails on its own and the rest are still written
+        # any error is handed to the punch's Future, the writer thread itself never dies
+        cursor = connection.cursor()
+        results = []
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            for eid, action, now, future in batch:
+                cursor.execute("SAVEPOINT punch")
+                try:
+                    results.append((future, record_punch(cursor, eid, action, now), None))
+                    cursor.execute("RELEASE punch")
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO punch")
+                    cursor.execute("RELEASE punch")
+                    results.append((future, None, e))
+            connection.commit()
+        except Exception as e:
+            if connection.in_transaction:
+                connection.rollback()
+            results = [(future, None, e) for *_, future in batch]
+
+        self.stats["batches"] += 1
+        for future, timestamp, error in results:
+            if error is None:
+                self.stats["punches"] += 1
+                future.set_result(timestamp)
+            else:
+                self.stats["errors"] += 1
+                future.set_exception(error)
+
+    def _run(self):
+        connection = get_connection(self.db_file)
+        try:
+            while True:
+                batch, stopping = self._next_batch()
+                if batch:
+                    self._write(connection, batch)
+                if stopping:
+                    break
+        finally:
+            close_connections()
+
+
+_service = None
+_service_lock = threading.Lock()
+
+# the process-wide service, started on first use and drained when the process exits
+def get_punch_service():
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = PunchService().start()
+            atexit.register(_service.stop)
+        return _service
+
+
+# counters of the process-wide service, zeros when it was never started (reading them doesn't start it)
+def punch_stats():
+    service = _service
+    return dict(service.stats) if service is not None else dict(EMPTY_STATS)
@@ -0,0 +1,300 @@
+#reports.py
+# attendance reports for the manager, computed for all employees at once
+import csv
+import heapq
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from itertools import groupby
+from operator import itemgetter
+from database import get_connection
+from Attendance import DAY_SECONDS, to_epoch, from_epoch, pair_punches, iter_shifts, rebuild_hours_rollup
+from coverage import schedule_intervals
+
+LONG_SHIFT_HOURS = 24 # longer shifts are still paid, but flagged so they can be checked
+
+# every employee's punches in the range plus the last punch before it and the first one after it,
+# so a shift crossing either end of the range is paired however long it is
+# employees are scanned in eid order and each one's punches come from the (eid, epoch) index,
+# so there is no sort and the cost follows the size of the range, not the whole history
+PAYROLL_QUERY = """
+    SELECT a.eid, a.action, a.epoch, e.fname, e.lname, e.salary
+    FROM employees e NOT INDEXED CROSS JOIN attendance a ON a.eid = e.eid
+    WHERE a.epoch >= COALESCE((SELECT MAX(epoch) FROM attendance WHERE eid = e.eid AND epoch < :start), :start)
+      AND a.epoch <= COALESCE((SELECT MIN(epoch) FROM attendance WHERE eid = e.eid AND epoch >= :end), :end)
+    ORDER BY e.eid, a.epoch, a.rowid
+"""
+
+PAYROLL_COLUMNS = ["eid", "fname", "lname", "rate", "shifts", "hours", "pay", "long_shifts", "unpaired"]
+
+# hours and pay for every employee who worked between first_day and last_day (both included)
+# punches are paired with pair_punches like the hours totals, and each shift is clipped to the range
+# long_shifts counts paid shifts over LONG_SHIFT_HOURS, unpaired counts punches in the range that
+# are in no shift (a Punch-In with no Punch-Out yet, or a Punch-Out with no Punch-In)
+def payroll_report(first_day, last_day):
+    start = to_epoch(datetime(first_day.year, first_day.month, first_day.day))
+    end = to_epoch(datetime(last_day.year, last_day.month, last_day.day) + timedelta(days=1))
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(PAYROLL_QUERY, {"start": start, "end": end})
+        rows = cursor.fetchall()
+
+    report = []
+    for eid, punches in groupby(rows, key=itemgetter(0)):
+        punches = list(punches)
+        shifts = seconds = long_shifts = 0
+        unpaired = sum(start <= punch[2] < end for punch in punches)
+        for punch_in, punch_out in pair_punches((punch[1], punch[2]) for punch in punches):
+            unpaired -= (start <= punch_in < end) + (start <= punch_out < end)
+            worked = min(punch_out, end) - max(punch_in, start)
+            if worked > 0:
+                shifts += 1
+                seconds += worked
+                long_shifts += punch_out - punch_in > LONG_SHIFT_HOURS * 3600
+        if not (shifts or unpaired):
+            continue
+        fname, lname, rate = punches[0][3:]
+        hours = seconds / 3600
+        rate = float(rate or 0)
+        report.append({"eid": eid, "fname": fname, "lname": lname, "rate": rate, "shifts": shifts,
+                       "hours": round(hours, 2), "pay": round(hours * rate, 2), "long_shifts": long_shifts,
+                       "unpaired": unpaired})
+    return report
+
+def write_payroll_csv(report, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=PAYROLL_COLUMNS)
+        writer.writeheader()
+        writer.writerows(report)
+
+def print_payroll(report):
+    from prettytable import PrettyTable # only the menus draw tables
+    table = PrettyTable()
+    table.field_names = ["ID", "Name", "Rate", "Shifts", "Hours", "Pay", "Long shifts", "Unpaired punches"]
+    for row in report:
+        table.add_row([row["eid"], f"{row['fname']} {row['lname']}", f"{row['rate']:.2f}", row["shifts"],
+                       f"{row['hours']:.2f}", f"{row['pay']:.2f}", row["long_shifts"], row["unpaired"]])
+    print(table)
+    print(f"Total hours: {sum(row['hours'] for row in report):.2f}  Total pay: {sum(row['pay'] for row in report):.2f}")
+    flagged = sum(1 for row in report if row["long_shifts"] or row["unpaired"])
+    if flagged:
+        print(f"{flagged} employee(s) have shifts over {LONG_SHIFT_HOURS} hours or unpaired punches, check them before paying.")
+
+def payroll_menu():
+    try:
+        first_day = date.fromisoformat(input("Enter start date (YYYY-MM-DD): "))
+        last_day = date.fromisoformat(input("Enter end date (YYYY-MM-DD): "))
+    except ValueError:
+        print("Invalid date format.")
+        return
+
+    report = payroll_report(first_day, last_day)
+    if not report:
+        print("No hours worked in that date range.")
+        return
+
+    path = input("Enter a CSV file name to save the report (leave blank to print it): ").strip()
+    if path:
+        write_payroll_csv(report, path)
+        print(f"Payroll for {len(report)} employees saved to {path}.")
+    else:
+        print_payroll(report)
+
+VARIANCE_GRACE_SECONDS = 5 * 60 # arriving or leaving within this of the scheduled time still counts as on time
+VARIANCE_BATCH_SIZE = 5000
+VARIANCE_COLUMNS = ["eid", "name", "date", "scheduled_start", "scheduled_end", "worked_minutes",
+                    "late_minutes", "early_minutes", "status"]
+SCHEDULED, WORKED = 0, 1
+
+def _fetch_batches(cursor):
+    while True:
+        rows = cursor.fetchmany(VARIANCE_BATCH_SIZE)
+        if not rows:
+            break
+        yield from rows
+
+def _scheduled_shifts(connection, first_day, last_day):
+    # (eid, SCHEDULED, start, end, name) for every scheduled shift, in eid order
+    cursor = connection.cursor()
+    cursor.execute("""
+        SELECT s.date, s.eid, s.morning_start, s.morning_end, s.evening_start, s.evening_end,
+               e.fname || ' ' || e.lname
+        FROM employees e NOT INDEXED CROSS JOIN schedule s ON s.eid = e.eid
+        WHERE s.date BETWEEN ? AND ?
+        ORDER BY e.eid, s.date
+    """, (first_day.isoformat(), last_day.isoformat()))
+    midnights = {}
+    for row in _fetch_batches(cursor):
+        day = row[0]
+        midnight = midnights.get(day)
+        if midnight is None:
+            midnight = midnights[day] = to_epoch(datetime.fromisoformat(day))
+        for _, eid, start, end in schedule_intervals((row[:6],)):
+            yield eid, SCHEDULED, midnight + start * 60, midnight + end * 60, row[6]
+
+def _worked_shifts(connection, start, end, now):
+    # (eid, WORKED, punch in, punch out, name) for every shift overlapping [start, end), clipped to it, in eid order
+    # punches are paired by iter_shifts from the last punch before start, a shift still open runs until now
+    cursor = connection.cursor()
+    cursor.execute("""
+        SELECT a.eid, a.action, a.epoch, e.fname || ' ' || e.lname
+        FROM employees e NOT INDEXED CROSS JOIN attendance a ON a.eid = e.eid
+        WHERE a.epoch >= COALESCE((SELECT MAX(epoch) FROM attendance WHERE eid = e.eid AND epoch < :start), :start)
+          AND a.epoch < :end
+        ORDER BY e.eid, a.epoch, a.rowid
+    """, {"start": start, "end": end})
+    for eid, punch_in, punch_out, name in iter_shifts(_fetch_batches(cursor), now):
+        if min(punch_out, end) > max(punch_in, start):
+            yield eid, WORKED, max(punch_in, start), min(punch_out, end), name
+
+@lru_cache(maxsize=None)
+def _day_text(day):
+    # day number since 1970-01-01 -> "YYYY-MM-DD"
+    return from_epoch(day * DAY_SECONDS).date().isoformat()
+
+def _time_text(epoch):
+    # same text as strftime(TIME_FORMAT), without building a datetime for every shift
+    day, seconds = divmod(epoch, DAY_SECONDS)
+    return f"{_day_text(day)} {seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+def _detail(eid, name, start, end, worked, late, early, status):
+    scheduled = status != "unscheduled"
+    return {"eid": eid, "name": name, "date": _day_text(start // DAY_SECONDS),
+            "scheduled_start": _time_text(start) if scheduled else "",
+            "scheduled_end": _time_text(end) if scheduled else "",
+            "worked_minutes": round(worked / 60, 1), "late_minutes": round(late / 60, 1),
+            "early_minutes": round(early / 60, 1), "status": status}
+
+def _reconcile(eid, name, scheduled, worked, grace):
+    # sweep both sorted lists once: the worked shifts before the pointer ended before the current
+    # scheduled shift started, so each scheduled shift only looks at the worked shifts it overlaps
+    inside = [0] * len(worked) # seconds of each worked shift that fall inside a scheduled shift
+    first = 0
+    for shift_start, shift_end in scheduled:
+        while first < len(worked) and worked[first][1] <= shift_start:
+            first += 1
+        arrived = left = None
+        seconds = 0
+        k = first
+        while k < len(worked) and worked[k][0] < shift_end:
+            overlap = min(worked[k][1], shift_end) - max(worked[k][0], shift_start)
+            if overlap > 0:
+                seconds += overlap
+                inside[k] += overlap
+                arrived = worked[k][0] if arrived is None else arrived
+                left = worked[k][1]
+            k += 1
+        if arrived is None:
+            yield _detail(eid, name, shift_start, shift_end, 0, 0, 0, "no-show")
+            continue
+        late = max(0, arrived - shift_start)
+        early = max(0, shift_end - left)
+        status = [label for label, seconds_off in (("late", late), ("left early", early)) if seconds_off > grace]
+        yield _detail(eid, name, shift_start, shift_end, seconds, late, early, " and ".join(status) or "on time")
+
+    for (punch_in, punch_out), seconds in zip(worked, inside):
+        if punch_out - punch_in - seconds > grace:
+            yield _detail(eid, name, punch_in, punch_out, punch_out - punch_in - seconds, 0, 0, "unscheduled")
+
+# compare the schedule with the punches between first_day and last_day (both included)
+# yields one dict per scheduled shift (on time, late, left early, no-show) and per stretch of work
+# outside the schedule (unscheduled), employee by employee; both sides are streamed from the database
+# in eid order and merged, so memory holds one employee's shifts at a time
+def iter_shift_variance(first_day, last_day, grace=VARIANCE_GRACE_SECONDS, now=None):
+    start = to_epoch(datetime(first_day.year, first_day.month, first_day.day))
+    end = to_epoch(datetime(last_day.year, last_day.month, last_day.day) + timedelta(days=1))
+    now = to_epoch(datetime.now()) if now is None else now
+    connection = get_connection()
+    merged = heapq.merge(_scheduled_shifts(connection, first_day, last_day),
+                         _worked_shifts(connection, start, end, now), key=itemgetter(0))
+    for eid, shifts in groupby(merged, key=itemgetter(0)):
+        sides = ([], [])
+        name = ""
+        for _, side, shift_start, shift_end, name in shifts:
+            sides[side].append((shift_start, shift_end))
+        sides[SCHEDULED].sort()
+        yield from _reconcile(eid, name, sides[SCHEDULED], sides[WORKED], grace)
+
+# totals per employee from the detail stream, in eid order
+def variance_summary(details):
+    summary = {}
+    for row in details:
+        totals = summary.get(row["eid"])
+        if totals is None:
+            totals = summary[row["eid"]] = {"eid": row["eid"], "name": row["name"], "scheduled": 0, "no_shows": 0,
+                                            "late": 0, "late_minutes": 0, "left_early": 0, "early_minutes": 0,
+                                            "unscheduled_minutes": 0}
+        if row["status"] == "unscheduled":
+            totals["unscheduled_minutes"] += row["worked_minutes"]
+            continue
+        totals["scheduled"] += 1
+        if row["status"] == "no-show":
+            totals["no_shows"] += 1
+        if "late" in row["status"]:
+            totals["late"] += 1
+            totals["late_minutes"] += row["late_minutes"]
+        if "left early" in row["status"]:
+            totals["left_early"] += 1
+            totals["early_minutes"] += row["early_minutes"]
+    return list(summary.values())
+
+def print_variance_summary(summary):
+    from prettytable import PrettyTable
+    table = PrettyTable()
+    table.field_names = ["ID", "Name", "Shifts", "No-shows", "Late", "Late min", "Left early", "Early min",
+                         "Unscheduled min"]
+    for row in summary:
+        table.add_row([row["eid"], row["name"], row["scheduled"], row["no_shows"], row["late"],
+                       f"{row['late_minutes']:.0f}", row["left_early"], f"{row['early_minutes']:.0f}",
+                       f"{row['unscheduled_minutes']:.0f}"])
+    print(table)
+
+def _written(details, writer):
+    for row in details:
+        writer.writerow(row)
+        yield row
+
+def variance_menu():
+    try:
+        first_day = date.fromisoformat(input("Enter start date (YYYY-MM-DD): "))
+        last_day = date.fromisoformat(input("Enter end date (YYYY-MM-DD): "))
+    except ValueError:
+        print("Invalid date format.")
+        return
+
+    path = input("Enter a CSV file name for the per-shift details (leave blank to skip): ").strip()
+    details = iter_shift_variance(first_day, last_day)
+    if path:
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=VARIANCE_COLUMNS)
+            writer.writeheader()
+            summary = variance_summary(_written(details, writer))
+        print(f"Per-shift details saved to {path}.")
+    else:
+        summary = variance_summary(details)
+
+    if not summary:
+        print("No scheduled or worked shifts in that date range.")
+        return
+    print_variance_summary(summary)
+
+#attendance reports for the manager
+def manager_attendance_menu():
+    while True:
+        print("\nAttendance Reports:")
+        print("1. Payroll report")
+        print("2. Rebuild hours totals")
+        print("3. Schedule vs attendance")
+        print("4. Exit")
+        choice = input("Choose an option: ")
+
+        if choice == '1':
+            payroll_menu()
+        elif choice == '2':
+            days = rebuild_hours_rollup()
+            print(f"Hours totals rebuilt ({days} employee-days).")
+        elif choice == '3':
+            variance_menu()
+        elif choice == '4':
+            break
+        else:
+            print("Invalid choice. Try again.")
@@ -1,56 +1,28 @@
 import sqlite3
-from datetime import datetime
-from prettytable import PrettyTable
-
-EMPLOYEE_DB_FILE = "employees.db"
-AVAILABILITY_DB_FILE = "availability.db"
-SCHEDULE_DB_FILE = "schedule.db"
+from datetime import datetime, timedelta
+from itertools import chain, islice
+from database import get_connection
+from employee import get_employee, existing_eids
+from scheduler import auto_schedule_menu
+from coverage import GRANULARITIES, coverage_for_range
 
 #create the table
 def create_availability_table():
-    with sqlite3.connect(AVAILABILITY_DB_FILE) as connection:
-        cursor = connection.cursor()
-        # create availability table if it doesn't exists
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS availability (
-                date TEXT,
-                eid INTEGER,
-                morning_availability TEXT,
-                evening_availability TEXT,
-                PRIMARY KEY (date, eid),
-                FOREIGN KEY (eid) REFERENCES employees(eid)
-            )
-        """)
-        connection.commit()
+    get_connection()
 
 # create the table
 def create_schedule_table():
     try:
-        with sqlite3.connect(SCHEDULE_DB_FILE) as connection:
-            cursor = connection.cursor()
-            # create schedule table if it doesn't exists
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS schedule (
-                    date TEXT NOT NULL,
-                    eid INTEGER NOT NULL,
-                    morning_start TEXT,
-                    morning_end TEXT,
-                    evening_start TEXT,
-                    evening_end TEXT,
-                    PRIMARY KEY (date, eid),
-                    FOREIGN KEY (eid) REFERENCES employees(eid)
-                )
-            ''')
-            connection.commit()
+        get_connection()
     except sqlite3.Error as e:
         print("Error creating schedule table:", e)
 
 #check that employee is present or not
 def employee_exists_in_db(eid):
-    with sqlite3.connect(EMPLOYEE_DB_FILE) as connection:
-        cursor = connection.cursor()
-        cursor.execute("SELECT 1 FROM employees WHERE eid = ?", (eid,))
-        return cursor.fetchone() is not None
+    try:
+        return get_employee(int(eid)) is not None # served from the employee cache when possible
+    except ValueError:
+        return False
 
 #check the date is future date or not
 def is_future_date(date_str):
@@ -85,6 +57,24 @@ def is_valid_time(ts, st):
     except ValueError:
         return None
 
+# check one shift's start and end ("HH:MM", '' or 'none' for no shift) with is_valid_time
+# a shift has both times or neither and ends after it starts; returns the two times, '' for no shift
+def check_shift(start, end, shift_type):
+    checked = []
+    for time_str in (start, end):
+        time_str = (time_str or '').strip()
+        if time_str == '' or time_str.lower() == 'none':
+            checked.append('')
+            continue
+        valid = is_valid_time(time_str, shift_type)
+        if not valid:
+            raise ValueError(f"Invalid {shift_type} time {time_str!r}.")
+        checked.append(valid)
+    start, end = checked
+    if bool(start) != bool(end) or (start and end <= start):
+        raise ValueError(f"Invalid {shift_type} shift {start or '?'}-{end or '?'}.")
+    return start, end
+
 def set_employee_availability():
     date = input("Enter date (YYYY-MM-DD): ")
     if not is_future_date(date):
@@ -98,36 +88,115 @@ def set_employee_availability():
         else:
             print("Invalid Employee ID. Please enter a valid Employee ID.")
 
-    with sqlite3.connect(AVAILABILITY_DB_FILE) as connection:
+    with get_connection() as connection:
         cursor = connection.cursor()
-
-        create_availability_table()
-
         cursor.execute("SELECT * FROM availability WHERE date = ? AND eid = ?", (date, eid))
         ea = cursor.fetchone()
 
-        if ea:
-            mea = ea[2] is not None and ea[2] != ''
-            eea = ea[3] is not None and ea[3] != ''
-
-            if mea or eea:
-                ca = input(
-                    f"You've already set your availability for Employee ID {eid} on this date. Do you want to change it? (yes/no): ").lower()
-                if ca != 'yes':
-                    return
-
-        ava = input("Are you available? (yes/no): ").lower()
-        if ava == 'yes':
-            while True:
-                shift = input(f"For Employee ID {eid}, are you available for 'morning', 'evening', or 'both'? ")
-                if shift in ['morning', 'evening', 'both']:
-                    break
-                print("Invalid choice. Please select 'morning', 'evening', or 'both'.")
-
-            cursor.execute(
-                "INSERT OR REPLACE INTO availability (date, eid, morning_availability, evening_availability) VALUES (?, ?, ?, ?)",
-                (date, eid, shift if shift in ['morning', 'both'] else '',
-                 shift if shift in ['evening', 'both'] else ''))
+    if ea:
+        mea = ea[2] is not None and ea[2] != ''
+        eea = ea[3] is not None and ea[3] != ''
+
+        if mea or eea:
+            ca = input(
+                f"You've already set your availability for Employee ID {eid} on this date. Do you want to change it? (yes/no): ").lower()
+            if ca != 'yes':
+                return
+
+    ava = input("Are you available? (yes/no): ").lower()
+    if ava == 'yes':
+        while True:
+            shift = input(f"For Employee ID {eid}, are you available for 'morning', 'evening', or 'both'? ")
+            if shift in ['morning', 'evening', 'both']:
+                break
+            print("Invalid choice. Please select 'morning', 'evening', or 'both'.")
+
+        set_availability_bulk([(date, eid, shift)]) # committed in its own transaction
+
+SHIFT_CHOICES = ('morning', 'evening', 'both')
+WEEKDAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+# availability_matrix cell values
+UNAVAILABLE, MORNING, EVENING, BOTH = 0, 1, 2, 3
+
+# save many (date, eid, shift) entries in one transaction, shift is 'morning', 'evening' or 'both'
+# returns (rows written, IDs that are not employees); rows for unknown IDs are skipped
+def set_availability_bulk(entries):
+    rows = []
+    for day, eid, shift in entries:
+        day = day.isoformat() if hasattr(day, 'isoformat') else datetime.strptime(day, '%Y-%m-%d').date().isoformat()
+        shift = shift.lower()
+        if shift not in SHIFT_CHOICES:
+            raise ValueError(f"Invalid shift {shift!r}, use 'morning', 'evening' or 'both'.")
+        rows.append((day, int(eid), shift if shift in ('morning', 'both') else '',
+                     shift if shift in ('evening', 'both') else ''))
+
+    known = existing_eids(row[1] for row in rows)
+    unknown = sorted({row[1] for row in rows} - known)
+    rows = [row for row in rows if row[1] in known]
+    with get_connection() as connection:
+        connection.executemany(
+            "INSERT OR REPLACE INTO availability (date, eid, morning_availability, evening_availability) VALUES (?, ?, ?, ?)",
+            rows)
+    return len(rows), unknown
+
+# save many (date, eid, morning_start, morning_end, evening_start, evening_end) entries in one transaction
+# times are "HH:MM", '' or 'none' for no shift; returns (rows written, IDs that are not employees)
+def set_schedule_bulk(entries):
+    rows = []
+    for day, eid, *times in entries:
+        day = day.isoformat() if hasattr(day, 'isoformat') else datetime.strptime(day, '%Y-%m-%d').date().isoformat()
+        morning = check_shift(times[0], times[1], 'morning')
+        evening = check_shift(times[2], times[3], 'evening')
+        rows.append((day, int(eid), *morning, *evening))
+
+    known = existing_eids(row[1] for row in rows)
+    unknown = sorted({row[1] for row in rows} - known)
+    rows = [row for row in rows if row[1] in known]
+    with get_connection() as connection:
+        connection.executemany(
+            "INSERT OR REPLACE INTO schedule (date, eid, morning_start, morning_end, evening_start, evening_end) VALUES (?, ?, ?, ?, ?, ?)",
+            rows)
+    return len(rows), unknown
+
+# turn a weekly pattern such as {'mon': 'morning', 'sat': 'both'} into entries for every date in the range
+def expand_weekly_pattern(eids, first_day, last_day, pattern):
+    pattern = {WEEKDAYS.index(day.lower()[:3]) if isinstance(day, str) else day: shift for day, shift in pattern.items()}
+    day = first_day
+    while day <= last_day:
+        shift = pattern.get(day.weekday())
+        if shift:
+            for eid in eids:
+                yield day, eid, shift
+        day += timedelta(days=1)
+
+# availability for every date in the range as a dense matrix
+# returns (dates, eids, matrix) with matrix[i][j] one of UNAVAILABLE, MORNING, EVENING, BOTH for dates[i], eids[j]
+def availability_matrix(first_day, last_day, eids=None):
+    dates = []
+    day = first_day
+    while day <= last_day:
+        dates.append(day.isoformat())
+        day += timedelta(days=1)
+
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT date, eid, morning_availability, evening_availability
+            FROM availability
+            WHERE date BETWEEN ? AND ?
+        """, (first_day.isoformat(), last_day.isoformat()))
+        rows = cursor.fetchall()
+
+    if eids is None:
+        eids = sorted({row[1] for row in rows})
+    row_of = {d: i for i, d in enumerate(dates)}
+    column_of = {eid: j for j, eid in enumerate(eids)}
+    matrix = [[UNAVAILABLE] * len(eids) for _ in dates]
+    for day, eid, morning, evening in rows:
+        j = column_of.get(eid)
+        if j is not None:
+            matrix[row_of[day]][j] = (MORNING if morning else 0) | (EVENING if evening else 0)
+    return dates, eids, matrix
 def manager_set_schedule():
     create_schedule_table()  # Ensure the schedule table exists
     date = input("Enter the date for which you're setting the schedule (YYYY-MM-DD): ")
@@ -140,7 +209,7 @@ def manager_set_schedule():
             print("Invalid Employee ID. Please enter a valid Employee ID.")
 
     # Check the availability database for existing data
-    with sqlite3.connect(AVAILABILITY_DB_FILE) as connection:
+    with get_connection() as connection:
         cursor = connection.cursor()
         cursor.execute("SELECT * FROM availability WHERE date = ? AND eid = ?", (date, eid))
         existing_availability = cursor.fetchone()
@@ -158,8 +227,6 @@ def manager_set_schedule():
     if eae:
         available_shifts.add('evening')
 
-    print(f"Debug: Available shifts: {available_shifts}")
-
     if not available_shifts:
         print(f"No shifts available for Employee ID {eid} on this date.")
         return
@@ -181,7 +248,7 @@ def manager_set_schedule():
             continue
 
         # Update the schedule
-        with sqlite3.connect(SCHEDULE_DB_FILE) as schedule_connection:
+        with get_connection() as schedule_connection:
             schedule_cursor = schedule_connection.cursor()
             schedule_cursor.execute(
                 "INSERT OR REPLACE INTO schedule (date, eid, morning_start, morning_end, evening_start, evening_end) VALUES (?, ?, ?, ?, ?, ?)",
@@ -239,70 +306,197 @@ def format_time(time_str):
     hour, minute = map(int, time_str.split(':'))
     return f"{hour:02d}:{minute:02d}"
 
+def ask_granularity():
+    text = input("Slot size in minutes (15, 30 or 60, leave blank for 60): ").strip()
+    granularity = int(text) if text else 60
+    if granularity not in GRANULARITIES:
+        raise ValueError
+    return granularity
+
 # Add this function to your existing code
 def view_schedule_for_date():
+    from prettytable import PrettyTable # only the menus draw tables, cli.py and api.py never load it
     date = input("Enter date (YYYY-MM-DD): ")
+    last = input("Enter the last date for a multi-day view (leave blank for one day): ").strip()
+    try:
+        first_day = datetime.strptime(date, "%Y-%m-%d").date()
+        last_day = datetime.strptime(last, "%Y-%m-%d").date() if last else first_day
+        granularity = ask_granularity()
+    except ValueError:
+        print("Invalid input.")
+        return
 
-    # Fetching schedule data
-    with sqlite3.connect(SCHEDULE_DB_FILE) as connection:
-        cursor = connection.cursor()
-        cursor.execute("SELECT DISTINCT eid FROM schedule WHERE date = ?", (date,))
-        eid = [row[0] for row in cursor.fetchall()]
-
-    if eid:
-        # Fetching employee names for the specified employee IDs
-        with sqlite3.connect(EMPLOYEE_DB_FILE) as connection:
-            employee_cursor = connection.cursor()
-            employee_cursor.execute("SELECT eid, fname FROM employees WHERE eid IN ({})".format(','.join('?' for _ in eid)), tuple(eid))
-            employee_data = dict(employee_cursor.fetchall())
-
-        # Fetching schedule data again for the specified date
-        with sqlite3.connect(SCHEDULE_DB_FILE) as connection:
-            cursor = connection.cursor()
-            cursor.execute("SELECT * FROM schedule WHERE date = ?", (date,))
-            schedule_data = cursor.fetchall()
-
-        # Create a dictionary to store the schedule for each employee
-        employee_schedule = {eid: [""] * 24 for eid in employee_data}
-
-        for entry in schedule_data:
-            eid, morning_start, morning_end, evening_start, evening_end = entry[1:]
-            for hour in range(24):
-                if (
-                    (morning_start and morning_end and int(morning_start[:2]) <= hour < int(morning_end[:2])) or
-                    (evening_start and evening_end and int(evening_start[:2]) <= hour < int(evening_end[:2]))
-                ):
-                    employee_schedule[eid][hour] = "✓"
-
-        # Create a PrettyTable
+    coverage = coverage_for_range(first_day, last_day, granularity)
+    if not coverage["grid"]:
+        print(f"No schedule data available for the specified date: {date}")
+        return
+
+    table = PrettyTable()
+    if first_day == last_day:
+        # one column per employee, a check mark for every slot they are on shift
+        day = first_day.isoformat()
+        grid = coverage["grid"][day]
+        table.field_names = ["Time", *(coverage["names"][eid] for eid in grid), "Staff"]
+        for slot, label in enumerate(coverage["slots"]):
+            table.add_row([label, *("✓" if cells[slot] else "" for cells in grid.values()),
+                           coverage["headcount"][day][slot]])
+    else:
+        # headcount per slot, one column per day
+        empty = [0] * len(coverage["slots"])
+        table.field_names = ["Time", *coverage["days"]]
+        for slot, label in enumerate(coverage["slots"]):
+            table.add_row([label, *(coverage["headcount"].get(day, empty)[slot] for day in coverage["days"])])
+
+    # Print the table
+    print(table)
+
+
+SCHEDULE_PAGE_SIZE = 31 # schedule rows per printed page
+
+# stream schedule rows (date, eid, name, morning_start, morning_end, evening_start, evening_end)
+# for a date range, an employee, or both; open ends when first_day/last_day are None
+# after=(date, eid) continues from the last row of a previous page
+def iter_schedule(first_day=None, last_day=None, eid=None, after=None, batch_size=500):
+    conditions = []
+    params = []
+    if eid is not None:
+        conditions.append("s.eid = ?") # served by idx_schedule_eid_date, already in date order
+        params.append(eid)
+    if first_day:
+        conditions.append("s.date >= ?")
+        params.append(str(first_day))
+    if last_day:
+        conditions.append("s.date <= ?")
+        params.append(str(last_day))
+    if after:
+        conditions.append("(s.date, s.eid) > (?, ?)")
+        params.extend(after)
+    query = """
+        SELECT s.date, s.eid, e.fname || ' ' || e.lname, s.morning_start, s.morning_end, s.evening_start, s.evening_end
+        FROM schedule s JOIN employees e ON e.eid = s.eid
+    """
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY s.date, s.eid"
+
+    cursor = get_connection().cursor()
+    try:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cursor.close()
+
+def print_schedule_pages(rows):
+    from prettytable import PrettyTable
+    # one table per page, the next page is only read from the database when asked for
+    rows = iter(rows)
+    while True:
+        page = list(islice(rows, SCHEDULE_PAGE_SIZE))
+        if not page:
+            break
         table = PrettyTable()
-        table.field_names = ["Hour", *employee_data.values()]
+        table.field_names = ["Date", "ID", "Name", "Morning", "Evening"]
+        for day, eid, name, morning_start, morning_end, evening_start, evening_end in page:
+            table.add_row([day, eid, name,
+                           f"{morning_start}-{morning_end}" if morning_start else "",
+                           f"{evening_start}-{evening_end}" if evening_start else ""])
+        print(table)
+        if len(page) < SCHEDULE_PAGE_SIZE:
+            break
+        if input("Press Enter for more or 'q' to stop: ").lower() == 'q':
+            break
 
-        for hour in range(24):
-            row_data = [f"{hour:02d}-{(hour + 1):02d}"]
-            for eid, schedule in employee_schedule.items():
-                row_data.append(schedule[hour])
-            table.add_row(row_data)
+# schedule over a range of dates, for everyone or for one employee
+def view_schedule_range():
+    first = input("Enter the first date (YYYY-MM-DD, leave blank for no limit): ").strip()
+    last = input("Enter the last date (YYYY-MM-DD, leave blank for no limit): ").strip()
+    eid = input("Enter Employee ID (leave blank for everyone): ").strip()
+    try:
+        first_day = datetime.strptime(first, "%Y-%m-%d").date() if first else None
+        last_day = datetime.strptime(last, "%Y-%m-%d").date() if last else None
+        eid = int(eid) if eid else None
+    except ValueError:
+        print("Invalid input.")
+        return
 
-        # Print the table
-        print(table)
-    else:
-        print(f"No schedule data available for the specified date: {date}")
+    rows = iter_schedule(first_day, last_day, eid)
+    first_row = next(rows, None)
+    if first_row is None:
+        print("No schedule found.")
+        return
+    print_schedule_pages(chain([first_row], rows))
 
 
+# availability for many employees and dates at once from a weekly pattern
+def set_recurring_availability():
+    ids = input("Enter Employee IDs separated by commas: ")
+    try:
+        eids = [int(eid) for eid in ids.split(',') if eid.strip()]
+        first_day = datetime.strptime(input("Enter first date (YYYY-MM-DD): "), '%Y-%m-%d').date()
+        last_day = datetime.strptime(input("Enter last date (YYYY-MM-DD): "), '%Y-%m-%d').date()
+    except ValueError:
+        print("Invalid input.")
+        return
+    if first_day <= datetime.today().date():
+        print("Please enter a future date.")
+        return
+
+    print("For each weekday enter 'morning', 'evening', 'both' or leave blank if not available.")
+    pattern = {}
+    for day in WEEKDAYS:
+        shift = input(f"{day.capitalize()}: ").strip().lower()
+        if shift and shift not in SHIFT_CHOICES:
+            print("Invalid choice. Please select 'morning', 'evening', or 'both'.")
+            return
+        pattern[day] = shift
+
+    written, unknown = set_availability_bulk(expand_weekly_pattern(eids, first_day, last_day, pattern))
+    if unknown:
+        print(f"Skipped unknown Employee IDs: {', '.join(map(str, unknown))}")
+    print(f"Saved {written} availability entries.")
+
+def view_availability_matrix():
+    from prettytable import PrettyTable
+    try:
+        first_day = datetime.strptime(input("Enter first date (YYYY-MM-DD): "), '%Y-%m-%d').date()
+    except ValueError:
+        print("Invalid date format.")
+        return
+    dates, eids, matrix = availability_matrix(first_day, first_day + timedelta(days=6))
+    if not eids:
+        print("No availability set for that week.")
+        return
+
+    labels = {UNAVAILABLE: "", MORNING: "M", EVENING: "E", BOTH: "M/E"}
+    table = PrettyTable()
+    table.field_names = ["Date", *eids]
+    for day, row in zip(dates, matrix):
+        table.add_row([day, *(labels[cell] for cell in row)])
+    print(table)
+
 def emp_schedule_menu():
     while True:
         print("\nSchedule Menu:")
         print("1. Set Employee Availability")
-        print("2. View Schedule for Date")
-        print("3. Exit")
+        print("2. Set Recurring Availability")
+        print("3. View Schedule for Date")
+        print("4. View Schedule for a Date Range")
+        print("5. Exit")
         choice = input("Choose an option: ")
 
         if choice == '1':
             set_employee_availability()
         elif choice == '2':
-            view_schedule_for_date()
+            set_recurring_availability()
         elif choice == '3':
+            view_schedule_for_date()
+        elif choice == '4':
+            view_schedule_range()
+        elif choice == '5':
             break
         else:
             print("Invalid choice. Try again.")
@@ -311,18 +505,30 @@ def Manager_schedule_menu():
     while True:
         print("\nSchedule Menu:")
         print("1. Set Employee Availability")
-        print("2. Manager Set Employee Schedule")
-        print("3. View Schedule for Date")
-        print("4. Exit")
+        print("2. Set Recurring Availability")
+        print("3. Manager Set Employee Schedule")
+        print("4. View Schedule for Date")
+        print("5. View Availability for Week")
+        print("6. Auto-generate Schedule")
+        print("7. View Schedule for a Date Range")
+        print("8. Exit")
         choice = input("Choose an option: ")
 
         if choice == '1':
             set_employee_availability()
         elif choice == '2':
-            manager_set_schedule()
+            set_recurring_availability()
         elif choice == '3':
-            view_schedule_for_date()
+            manager_set_schedule()
         elif choice == '4':
+            view_schedule_for_date()
+        elif choice == '5':
+            view_availability_matrix()
+        elif choice == '6':
+            auto_schedule_menu()
+        elif choice == '7':
+            view_schedule_range()
+        elif choice == '8':
             break
         else:
             print("Invalid choice. Try again.")
@@ -0,0 +1,164 @@
+#scheduler.py
+# automatic shift scheduling from the availability table
+# a greedy pass covers every hour's staffing need with the least-scheduled available employees,
+# then a local search trims overstaffed shift edges and hands shifts to employees with fewer hours
+from datetime import date
+from database import get_connection
+
+SHIFT_HOURS = {"morning": (5, 12), "evening": (12, 24)} # same limits as is_valid_time
+MIN_SHIFT_HOURS = 3
+MAX_SHIFT_HOURS = 8
+LOCAL_SEARCH_PASSES = 5
+
+# {day: {"morning": [eid, ...], "evening": [eid, ...]}} for every date with availability in the range
+def load_availability(first_day, last_day):
+    availability = {}
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT date, eid, morning_availability, evening_availability
+            FROM availability
+            WHERE date BETWEEN ? AND ?
+            ORDER BY date, eid
+        """, (first_day.isoformat(), last_day.isoformat()))
+        for day, eid, morning, evening in cursor.fetchall():
+            shifts = availability.setdefault(day, {"morning": [], "evening": []})
+            if morning:
+                shifts["morning"].append(eid)
+            if evening:
+                shifts["evening"].append(eid)
+    return availability
+
+def _fill_shift(candidates, need, hours, working, max_hours, min_shift, max_shift):
+    # greedy: for the earliest understaffed hour, give a shift to the available employee with the
+    # fewest hours so far, running while the following hours are still understaffed
+    open_hour, close_hour = min(need), max(need) + 1
+    coverage = {hour: 0 for hour in need}
+    blocks = {}
+    for hour in range(open_hour, close_hour):
+        while coverage[hour] < need[hour]:
+            free = [eid for eid in candidates
+                    if eid not in working and max_hours - hours.get(eid, 0) >= min(min_shift, close_hour - hour)]
+            if not free:
+                break
+            eid = min(free, key=lambda e: (hours.get(e, 0), e))
+            limit = min(max_shift, max_hours - hours.get(eid, 0))
+            start = end = hour
+            while end < close_hour and end - start < limit and coverage[end] < need[end]:
+                end += 1
+            # stretch to the minimum shift length, later first, then earlier
+            while end - start < min(min_shift, limit) and end < close_hour:
+                end += 1
+            while end - start < min(min_shift, limit) and start > open_hour:
+                start -= 1
+            blocks[eid] = [start, end]
+            working.add(eid)
+            hours[eid] = hours.get(eid, 0) + end - start
+            for covered in range(start, end):
+                coverage[covered] += 1
+
+    # local search: drop first and last hours that are overstaffed, keeping the minimum length
+    for eid, block in blocks.items():
+        while block[1] - block[0] > min_shift and coverage[block[0]] > need[block[0]]:
+            coverage[block[0]] -= 1
+            block[0] += 1
+            hours[eid] -= 1
+        while block[1] - block[0] > min_shift and coverage[block[1] - 1] > need[block[1] - 1]:
+            coverage[block[1] - 1] -= 1
+            block[1] -= 1
+            hours[eid] -= 1
+
+    shortages = {hour: need[hour] - coverage[hour] for hour in need if coverage[hour] < need[hour]}
+    return blocks, shortages
+
+def _balance(plan, availability, hours, max_hours):
+    # local search: move a shift from an employee to an available one with fewer hours
+    # whenever that narrows the gap between them
+    for _ in range(LOCAL_SEARCH_PASSES):
+        moved = False
+        for (day, shift), blocks in plan.items():
+            busy = set()
+            for other in ("morning", "evening"):
+                busy.update(plan.get((day, other), {}))
+            for eid in sorted(blocks, key=lambda e: (-hours[e], e)):
+                length = blocks[eid][1] - blocks[eid][0]
+                best = min((e for e in availability[day][shift]
+                            if e not in busy and hours.get(e, 0) + length <= max_hours),
+                           key=lambda e: (hours.get(e, 0), e), default=None)
+                if best is not None and hours.get(best, 0) + length < hours[eid]:
+                    blocks[best] = blocks.pop(eid)
+                    busy.discard(eid)
+                    busy.add(best)
+                    hours[eid] -= length
+                    hours[best] = hours.get(best, 0) + length
+                    moved = True
+        if not moved:
+            break
+
+# build a schedule for every day in the range that has availability
+# requirements: {hour: employees needed}, the same for every day
+# max_hours: most hours any employee gets over the whole range; nobody works two shifts in a day
+# returns {"plan": {(day, shift): {eid: [start hour, end hour]}}, "hours": {eid: hours},
+#          "shortages": [(day, shift, hour, missing)]}
+def auto_schedule(first_day, last_day, requirements, max_hours=40, min_shift=MIN_SHIFT_HOURS,
+                  max_shift=MAX_SHIFT_HOURS, availability=None):
+    if availability is None:
+        availability = load_availability(first_day, last_day)
+    plan = {}
+    hours = {}
+    shortages = []
+    for day in sorted(availability):
+        working = set()
+        for shift, (open_hour, close_hour) in SHIFT_HOURS.items():
+            need = {hour: requirements.get(hour, 0) for hour in range(open_hour, close_hour)}
+            if not any(need.values()):
+                continue
+            blocks, missing = _fill_shift(availability[day][shift], need, hours, working,
+                                          max_hours, min_shift, max_shift)
+            if blocks:
+                plan[day, shift] = blocks
+            shortages.extend((day, shift, hour, count) for hour, count in sorted(missing.items()))
+
+    _balance(plan, availability, hours, max_hours)
+    return {"plan": plan, "hours": {eid: h for eid, h in hours.items() if h}, "shortages": shortages}
+
+# write a plan to the schedule table in one transaction
+# only the (date, eid) rows in the plan are replaced, shifts entered by hand for anyone else are kept
+def save_schedule(plan):
+    rows = {}
+    for (day, shift), blocks in plan.items():
+        for eid, (start, end) in blocks.items():
+            row = rows.setdefault((day, eid), {"morning": ("", ""), "evening": ("", "")})
+            row[shift] = (f"{start:02d}:00", f"{end:02d}:00")
+
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.executemany(
+            "INSERT OR REPLACE INTO schedule (date, eid, morning_start, morning_end, evening_start, evening_end) VALUES (?, ?, ?, ?, ?, ?)",
+            [(day, eid, *row["morning"], *row["evening"]) for (day, eid), row in sorted(rows.items())])
+    return len(rows)
+
+def auto_schedule_menu():
+    try:
+        first_day = date.fromisoformat(input("Enter the first date (YYYY-MM-DD): "))
+        last_day = date.fromisoformat(input("Enter the last date (YYYY-MM-DD): "))
+        morning = int(input("Employees needed per hour in the morning (05-12): "))
+        evening = int(input("Employees needed per hour in the evening (12-24): "))
+        max_hours = int(input("Most hours per employee in this range: "))
+    except ValueError:
+        print("Invalid input.")
+        return
+
+    requirements = {hour: morning for hour in range(*SHIFT_HOURS["morning"])}
+    requirements.update({hour: evening for hour in range(*SHIFT_HOURS["evening"])})
+    result = auto_schedule(first_day, last_day, requirements, max_hours)
+    if not result["plan"]:
+        print("No availability found for that date range.")
+        return
+
+    count = save_schedule(result["plan"])
+    print(f"Scheduled {count} shifts for {len(result['hours'])} employees.")
+    if result["shortages"]:
+        print("Hours that could not be fully staffed:")
+        for day, shift, hour, missing in result["shortages"]:
+            print(f"- {day} {hour:02d}:00 ({shift}): {missing} short")
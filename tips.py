@@ -0,0 +1,160 @@
+#tips.py
+# tip pooling: each service window's tips are shared by the employees on shift during it,
+# in proportion to the minutes each one worked inside the window, and written to the tip ledger
+from datetime import date, datetime, timedelta
+from database import get_connection
+from employee import get_employee
+from Attendance import to_epoch, shift_intervals
+from intervals import IntervalIndex
+
+LEDGER_QUERY = """
+    INSERT INTO tip_ledger (day, window_start, window_end, eid, minutes, amount_cents)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+# split total_cents over {key: weight} in proportion to the weights, to the cent
+# every key gets its floor share and the cents left over go to the largest remainders
+def split_cents(total_cents, weights):
+    total_weight = sum(weights.values())
+    if total_cents <= 0 or total_weight <= 0:
+        return {key: 0 for key in weights}
+    shares = {}
+    remainders = []
+    for key, weight in weights.items():
+        share, remainder = divmod(total_cents * weight, total_weight)
+        shares[key] = int(share)
+        remainders.append((-remainder, key))
+    left = total_cents - sum(shares.values())
+    for _, key in sorted(remainders)[:left]:
+        shares[key] += 1
+    return shares
+
+def parse_time(text):
+    # "8", "20" or "20:30" -> (hour, minute)
+    text = text.strip()
+    if ':' in text:
+        hour, minute = map(int, text.split(':'))
+    else:
+        hour, minute = int(text), 0
+    if not (0 <= hour and 0 <= minute < 60 and (hour, minute) <= (24, 0)): # 24:00 is the end of the day
+        raise ValueError(f"Invalid time {text!r}")
+    return hour, minute
+
+# share the tips of every window of one day and record them in the ledger, all in one pass
+# windows: list of (start "HH:MM", end "HH:MM", amount); returns one result per window
+def distribute_tips(day, windows):
+    midnight = datetime(day.year, day.month, day.day)
+    spans = []
+    for start, end, amount in windows:
+        sh, sm = parse_time(start)
+        eh, em = parse_time(end)
+        window_start = midnight + timedelta(hours=sh, minutes=sm)
+        window_end = midnight + timedelta(hours=eh, minutes=em)
+        if window_end <= window_start:
+            raise ValueError(f"Window {start}-{end} ends before it starts.")
+        # labels from the parsed times, so a window ending at midnight reads 24:00 rather than 00:00
+        start_text, end_text = f"{sh:02d}:{sm:02d}", f"{eh:02d}:{em:02d}"
+        if any(span[2:4] == (start_text, end_text) for span in spans):
+            raise ValueError(f"Window {start_text}-{end_text} is entered twice.")
+        spans.append((to_epoch(window_start), to_epoch(window_end), start_text, end_text,
+                      int(round(float(amount) * 100))))
+
+    # one index over every shift of the day answers all the windows
+    first = min(span[0] for span in spans)
+    last = max(span[1] for span in spans)
+    index = IntervalIndex((shift_start, shift_end, (eid, shift_start, shift_end))
+                          for shift_start, shift_end, eid in shift_intervals(first, last))
+
+    results = []
+    ledger = []
+    for start, end, start_text, end_text, cents in spans:
+        seconds = {}
+        for eid, shift_start, shift_end in index.overlapping(start, end):
+            seconds[eid] = seconds.get(eid, 0) + min(shift_end, end) - max(shift_start, start)
+        shares = split_cents(cents, seconds)
+        rows = [{"eid": eid, "minutes": round(seconds[eid] / 60, 2), "amount": shares[eid] / 100}
+                for eid in sorted(seconds)]
+        results.append({"start": start_text, "end": end_text, "tips": cents / 100, "shares": rows})
+        ledger.extend((day.isoformat(), start_text, end_text, row["eid"], row["minutes"], shares[row["eid"]])
+                      for row in rows)
+
+    with get_connection() as connection:
+        # a window shared again replaces all of its rows, including those of employees no longer in it
+        connection.executemany("DELETE FROM tip_ledger WHERE day = ? AND window_start = ? AND window_end = ?",
+                               [(day.isoformat(), span[2], span[3]) for span in spans])
+        connection.executemany(LEDGER_QUERY, ledger)
+    return results
+
+def print_tip_results(results):
+    from prettytable import PrettyTable # only the menu draws tables
+    totals = {}
+    for result in results:
+        print(f"\n{result['start']}-{result['end']}: {result['tips']:.2f} in tips")
+        if not result["shares"]:
+            print("No employees were working, nothing distributed.")
+            continue
+        table = PrettyTable()
+        table.field_names = ["ID", "Name", "Minutes", "Tips"]
+        for row in result["shares"]:
+            emp = get_employee(row["eid"]) # served from the employee cache when possible
+            table.add_row([row["eid"], emp.get_full_name() if emp else "", f"{row['minutes']:.0f}", f"{row['amount']:.2f}"])
+            totals[row["eid"]] = totals.get(row["eid"], 0) + row["amount"]
+        print(table)
+
+    if totals:
+        print("\nTotal tips for the day:")
+        for eid, amount in sorted(totals.items()):
+            print(f"- {eid}: {amount:.2f}")
+
+def tips_distribution():
+    # Option for distributing tips
+    ch = ['yes', 'no']
+    print("Do you want to distribute tips? (yes/no)")
+    for i, option in enumerate(ch, start=1):
+        print(f"{i}. {option}")
+    try:
+        dis = int(input()) - 1
+        dc = ch[dis].lower()
+    except (ValueError, IndexError):
+        dc = None  # Invalid choice
+
+    if dc == 'yes':
+        day = input("Enter the date (YYYY-MM-DD, leave blank for today): ").strip()
+        try:
+            day = date.fromisoformat(day) if day else date.today()
+        except ValueError:
+            print("Invalid date format.")
+            return
+
+        print("Enter each service window and its tips as 'start-end amount' (e.g. 11-15 120.50 or 20-22:30 80).")
+        print("Leave blank when done.")
+        windows = []
+        while True:
+            line = input("Window: ").strip()
+            if not line:
+                break
+            try:
+                time_range, amount = line.split()
+                start, end = time_range.split('-')
+                parse_time(start)
+                parse_time(end)
+                if float(amount) <= 0:
+                    raise ValueError
+            except ValueError:
+                print("Invalid window, use 'start-end amount' with a positive amount.")
+                continue
+            windows.append((start, end, amount))
+
+        if not windows:
+            print("No windows entered.")
+            return
+        try:
+            results = distribute_tips(day, windows)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+        print_tip_results(results)
+    elif dc == 'no':
+        print("Okay, have a nice day!")
+    else:
+        print("Invalid choice!")